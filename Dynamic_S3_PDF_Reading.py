@@ -1,13 +1,23 @@
-import boto3
 import csv
 
+from pdf_manifest import list_changed_pdfs, record_processed, stored_rows
+from rate_limiter import limited_client
+from run_journal import RunJournal
+from s3_transfer import get_s3_client
+from textract_cache import TextractCache, cached_analyze_document, s3_content_id
+
 # AWS Clients
-s3 = boto3.client('s3')
-textract = boto3.client('textract', region_name='us-east-1')
+s3 = get_s3_client()
+textract = limited_client('textract', 'us-east-1')
+textract_cache = TextractCache()
 
 # Define S3 bucket and folder
-bucket_name = "vascculogic"
+s3_bucket = "vascculogic"
+s3_folder = "pdf/"  # every new or changed PDF under this prefix is extracted
 file_name = "pdf/processed_20230408.pdf"
+output_csv = "dynamic_s3_pdfs.csv"  # rewritten in full on every run
+manifest_file = "dynamic_s3_pdfs.manifest.json"  # PDFs already extracted, with their CSV rows
+journal_file = "dynamic_s3_pdfs.journal.jsonl"  # per-PDF progress, lets an interrupted run resume
 # Define fields to extract
 fields = [
     "Black Box Warning",
@@ -21,18 +31,22 @@ fields = [
     "Clinical Discontinuation"
 ]
 
-# Function to list all PDFs in the S3 folder
+# Function to list the new or changed PDFs in the S3 folder (paginated)
 def list_pdfs(bucket, folder):
-    response = s3.list_objects_v2(Bucket=bucket, Prefix=folder)
-    if "Contents" not in response:
+    pdf_keys, listing = list_changed_pdfs(s3, bucket, folder, manifest_file, with_rows=True)
+    if not listing:
         raise Exception("No files found in the specified S3 folder.")
-    return [obj["Key"] for obj in response["Contents"] if obj["Key"].endswith(".pdf")]
+    return pdf_keys, listing
 
 # Function to process a PDF with Textract
 def process_pdf(s3_bucket, file_name):
-    response = textract.analyze_document(
-        Document={"S3Object": {"Bucket": s3_bucket, "Name": file_name}},
-        FeatureTypes=["TABLES", "FORMS"]
+    # Byte-identical PDFs we already paid for are served from the local cache
+    response = cached_analyze_document(
+        textract,
+        textract_cache,
+        s3_content_id(s3, s3_bucket, file_name),
+        ["TABLES", "FORMS"],
+        {"S3Object": {"Bucket": s3_bucket, "Name": file_name}}
     )
 
     # Extract text blocks from response
@@ -69,24 +83,41 @@ def extract_fields(text):
 # Main script logic
 try:
     # List PDFs dynamically from S3
-    pdf_files = list_pdfs(s3_bucket, s3_folder)
-    if not pdf_files:
-        raise Exception("No PDF files found in the specified folder.")
-    
-    print(f"Found {len(pdf_files)} PDF files in {s3_folder}")
+    pdf_files, pdf_listing = list_pdfs(s3_bucket, s3_folder)
+    print(f"Found {len(pdf_files)} new or changed PDF files in {s3_folder}")
+
+    # The CSV is rewritten in full: PDFs extracted by an earlier run keep
+    # the rows stored with them in the manifest, and PDFs an interrupted
+    # run already extracted keep their journaled rows
+    journal = RunJournal(journal_file)
+    versions = {f: pdf_listing[f]['ETag'] for f in pdf_files}
+    unchanged = stored_rows(manifest_file, sorted(set(pdf_listing) - set(pdf_files)))
+    rows = {f: journal.entry(f, versions[f])['row'] for f in pdf_files if journal.done(f, versions[f])}
+    if rows:
+        print(f"Resuming: {len(rows)} PDF(s) already extracted.")
 
     # Process PDFs and write to CSV
-    with open(output_csv, mode="w", newline="", encoding="utf-8") as csv_file:
+    with journal, open(output_csv, mode="w", newline="", encoding="utf-8") as csv_file:
         writer = csv.DictWriter(csv_file, fieldnames=["PDF Name"] + fields)
         writer.writeheader()
+        writer.writerows(unchanged)
+        writer.writerows(rows.values())
 
         for pdf_file in pdf_files:
+            if pdf_file in rows:
+                continue
             print(f"Processing {pdf_file}...")
             text = process_pdf(s3_bucket, pdf_file)
             extracted_data = extract_fields(text)
             extracted_data["PDF Name"] = pdf_file
             writer.writerow(extracted_data)
+            csv_file.flush()
+            journal.record(pdf_file, "extracted", versions[pdf_file], row=extracted_data)
+            rows[pdf_file] = extracted_data
 
+    # Every PDF is in the manifest now, so the journal has nothing left to resume
+    record_processed(manifest_file, pdf_listing, pdf_files, rows)
+    journal.discard()
     print(f"Extraction completed. Data saved to {output_csv}")
 
 except Exception as e:
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Textract parsers and extractors over the checked-in
+fixtures. Run before and after a change:
+
+    python bench_textract.py --save-baseline     # on the old code
+    python bench_textract.py                     # on the new code; exits 1 on a regression
+
+Each case is timed --repeat times and the median is kept. Timings are
+compared to the baseline with a relative --tolerance, since they are only
+comparable on the same machine.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+from extract_textract_v0 import extract_section_14_data, group_text_by_page, parse_textract_response
+from process_testract_json_V1 import parse_textract
+from report_writers import open_report_writer
+from section_index import SectionIndex
+from textract_stream import iter_blocks, iter_words
+
+# ---------------
+# CONFIGURATION
+# ---------------
+FIXTURES = ["output", "output.json", "output_01072025.json", "textract_output.json"]
+BASELINE_FILE = "bench_baseline.json"
+REPEAT = 5
+TOLERANCE = 0.25  # allowed slowdown before a case counts as a regression
+
+
+# ---------------
+# CASES
+# ---------------
+
+def _timed(function, repeat):
+    """Return (median seconds, last result) of `repeat` calls."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def _fields_extractor():
+    """extract_fields_from_text, or None where its AWS clients cannot be created."""
+    try:
+        from extract_textract_data import extract_fields_from_text
+        return extract_fields_from_text
+    except Exception as e:
+        print(f"Skipping extract_fields_from_text: {e}")
+        return None
+
+
+def bench_fixture(fixture, repeat, extract_fields_from_text=None):
+    """Return {metric: value} for one fixture."""
+    metrics = {}
+
+    # Load: stream every block
+    seconds, blocks = _timed(lambda: sum(1 for _ in iter_blocks(fixture)), repeat)
+    metrics["load_seconds"] = seconds
+    metrics["blocks_per_second"] = blocks / seconds if seconds else 0.0
+
+    # group_text_by_page with the section index it builds in the same pass
+    seconds, pages = _timed(lambda: group_text_by_page(fixture, SectionIndex()), repeat)
+    metrics["group_text_by_page_seconds"] = seconds
+
+    seconds, _ = _timed(lambda: extract_section_14_data(pages), repeat)
+    metrics["extract_section_14_seconds"] = seconds
+
+    # End-to-end extraction latency of one document
+    seconds, _ = _timed(lambda: parse_textract_response(fixture), repeat)
+    metrics["extraction_latency_seconds"] = seconds
+
+    seconds, _ = _timed(lambda: parse_textract(fixture), repeat)
+    metrics["field_rules_latency_seconds"] = seconds
+
+    if extract_fields_from_text is not None:
+        lines = [line for page in sorted(pages) for line in pages[page]]
+        seconds, _ = _timed(lambda: extract_fields_from_text(lines), repeat)
+        metrics["extract_fields_from_text_seconds"] = seconds
+
+    # Export: the words.py WORD -> report stream
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "words.csv")
+
+        def export():
+            with open_report_writer(path, ["Words"]) as writer:
+                for _, word in iter_words(fixture):
+                    writer.write_row({"Words": word})
+            return writer.rows_written
+
+        seconds, rows = _timed(export, repeat)
+    metrics["export_rows_per_second"] = rows / seconds if seconds else 0.0
+    return metrics
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# ---------------
+# BASELINE
+# ---------------
+
+def _higher_is_better(metric):
+    return metric.endswith("_per_second")
+
+
+def compare(results, baseline, tolerance):
+    """Return the list of regressions of `results` against `baseline`."""
+    regressions = []
+    for name, value in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        if _higher_is_better(name):
+            worse = value < old / (1 + tolerance)
+        else:
+            worse = value > old * (1 + tolerance)
+        if worse:
+            regressions.append(f"{name}: {old:.6g} -> {value:.6g}")
+    return regressions
+
+
+def run(fixtures, repeat):
+    """Run every case; return {"<fixture>:<metric>": value, "peak_rss_mb": ...}."""
+    extract_fields_from_text = _fields_extractor()
+    results = {}
+    for fixture in fixtures:
+        if not os.path.exists(fixture):
+            print(f"Skipping missing fixture {fixture}")
+            continue
+        for metric, value in bench_fixture(fixture, repeat, extract_fields_from_text).items():
+            results[f"{fixture}:{metric}"] = value
+    results["peak_rss_mb"] = peak_rss_mb()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Textract parsers over the fixtures.")
+    parser.add_argument("fixtures", nargs="*", default=FIXTURES, help="fixtures to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="runs per case; the median is kept")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="relative slowdown allowed before failing (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    results = run(args.fixtures, args.repeat)
+    width = max(len(name) for name in results)
+    for name, value in results.items():
+        print(f"{name:<{width}}  {value:14.6f}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"machine": platform.platform(), "python": platform.python_version(),
+                       "results": results}, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline first.")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline["results"], args.tolerance)
+    if regressions:
+        print(f"\nREGRESSIONS (more than {args.tolerance:.0%} worse than {args.baseline}):")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"\nNo regressions against {args.baseline}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
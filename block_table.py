@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pandas as pd
+
+from textract_stream import iter_blocks
+
+# ---------------
+# CONFIGURATION
+# ---------------
+COLUMNS = ['id', 'type', 'page', 'text', 'confidence', 'left', 'top', 'width', 'height', 'parent']
+NO_PARENT = -1
+
+
+# ---------------
+# FUNCTIONS
+# ---------------
+
+def load_block_table(source, block_types=None, pages=None):
+    """
+    Load Textract blocks into a columnar DataFrame, one row per block:
+
+        id          block Id
+        type        BlockType (categorical)
+        page        page number (int32)
+        text        Text, empty for blocks without one
+        confidence  Confidence (float64 as in the JSON, NaN when absent)
+        left, top, width, height
+                    bounding box as page fractions (float32)
+        parent      row of the first block that lists this one as a child
+                    (a WORD's LINE, a LINE's PAGE, a CELL's TABLE), or -1
+
+    `source` is anything textract_stream.iter_blocks accepts: a response
+    dict, a JSON file, a job's shard directory (merged in page order) or an
+    iterable of blocks. The blocks are streamed, so only the table is kept.
+
+    Filters become single expressions, e.g. confident lines in the top
+    fifth of page 1:
+
+        t = load_block_table("output.json")
+        t[(t.type == 'LINE') & (t.page == 1) & (t.confidence > 90) & (t.top < 0.2)]
+    """
+    ids, types, page_numbers, texts = [], [], [], []
+    confidence, boxes = [], []
+    child_ids = []  # (row, [Id, ...]) from CHILD relationships
+
+    for row, block in enumerate(iter_blocks(source, block_types=block_types, pages=pages)):
+        ids.append(block['Id'])
+        types.append(block['BlockType'])
+        page_numbers.append(block.get('Page', 1))
+        texts.append(block.get('Text', ''))
+        confidence.append(block.get('Confidence', np.nan))
+        box = block.get('Geometry', {}).get('BoundingBox')
+        boxes.append((box['Left'], box['Top'], box['Width'], box['Height']) if box else (np.nan,) * 4)
+        for relationship in block.get('Relationships') or ():
+            if relationship['Type'] == 'CHILD':
+                child_ids.append((row, relationship['Ids']))
+
+    position = {block_id: row for row, block_id in enumerate(ids)}
+    parent = np.full(len(ids), NO_PARENT, dtype=np.int32)
+    for row, children in child_ids:
+        for child_id in children:
+            child = position.get(child_id)
+            if child is not None and parent[child] == NO_PARENT:
+                parent[child] = row
+
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    return pd.DataFrame({
+        'id': pd.Series(ids, dtype=object),
+        'type': pd.Categorical(types),
+        'page': np.asarray(page_numbers, dtype=np.int32),
+        'text': pd.Series(texts, dtype=object),
+        'confidence': np.asarray(confidence, dtype=np.float64),
+        'left': boxes[:, 0],
+        'top': boxes[:, 1],
+        'width': boxes[:, 2],
+        'height': boxes[:, 3],
+        'parent': parent,
+    }, columns=COLUMNS)
+
+
+def children_of(table, rows):
+    """Return the rows of `table` whose parent is one of `rows` (row positions)."""
+    return table[np.isin(table['parent'].to_numpy(), np.asarray(rows))]
+
+
+def page_text(table, page):
+    """Return the LINE text of one page, in reading order as Textract emitted it."""
+    lines = table[(table['type'] == 'LINE') & (table['page'] == page)]
+    return "\n".join(lines['text'])
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Reparse a local archive of stored Textract output on all cores.
+
+    python bulk_parse.py output/ output.json textract_output.json -o bulk_parse.csv
+
+Every argument is a Textract JSON file, a job's shard directory, or a
+directory searched for both. Each shard (or single-file response) is decoded
+in a worker process, using orjson when it is installed; workers send back
+only the page/line text and block counts, never the block trees. The parent
+stitches the shards of each document together in page order and runs the
+field rules over its lines, writing one report row per document. A
+document with a shard that cannot be parsed is counted as failed and gets
+no row.
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+from process_testract_json_V1 import FIELD_RULES, FIELDNAMES
+from report_writers import open_report_writer
+from textract_stream import shard_paths
+
+# ---------------
+# CONFIGURATION
+# ---------------
+DEFAULT_OUTPUT = "bulk_parse.csv"
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+
+# ---------------
+# FUNCTIONS
+# ---------------
+
+def find_documents(paths):
+    """
+    Return [(document name, [file, ...])] for the given paths. A directory
+    with numbered shards is one document; other directories are searched
+    for .json files and shard directories. A path that does not exist is
+    kept as a one-file document, so it is reported as failed like a file
+    that cannot be parsed instead of stopping the run.
+    """
+    documents = []
+    for path in paths:
+        if os.path.isfile(path) or not os.path.exists(path):
+            documents.append((path, [path]))
+        elif shard_paths(path):
+            documents.append((path.rstrip(os.sep), shard_paths(path)))
+        elif os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.startswith('.'):
+                    continue
+                child = os.path.join(path, name)
+                if os.path.isdir(child) or name.lower().endswith('.json'):
+                    documents.extend(find_documents([child]))
+    return documents
+
+
+def parse_shard(path):
+    """
+    Worker: decode one shard and return its compact result,
+    (lines as [(page, text)], Counter of block types).
+    """
+    with open(path, "rb") as f:
+        data = _loads(f.read())
+    if not isinstance(data, dict):
+        return [], Counter()
+    lines = []
+    counts = Counter()
+    for block in data.get("Blocks", ()):
+        block_type = block.get("BlockType")
+        counts[block_type] += 1
+        if block_type == "LINE":
+            lines.append((block.get("Page", 1), block.get("Text", "")))
+    return lines, counts
+
+
+def summarize_document(name, shard_results):
+    """Combine a document's shard results into its report row."""
+    lines = []
+    counts = Counter()
+    for shard_lines, shard_counts in shard_results:
+        lines.extend(shard_lines)
+        counts.update(shard_counts)
+
+    row = {field: "" for field in FIELDNAMES}
+    row["Black Box Warning"] = "N"
+    for field, value in FIELD_RULES.extract(text for _, text in lines).items():
+        row[field] = ", ".join(value) if isinstance(value, list) else value
+    row.update({
+        "Document": name,
+        "Shards": len(shard_results),
+        "Pages": len({page for page, _ in lines}),
+        "Blocks": sum(counts.values()),
+        "Lines": counts["LINE"],
+        "Words": counts["WORD"],
+        "Tables": counts["TABLE"],
+    })
+    return row
+
+
+def bulk_parse(paths, output=DEFAULT_OUTPUT, workers=DEFAULT_WORKERS):
+    """Parse every document under `paths` in a process pool; return the rows written."""
+    documents = find_documents(paths)
+    tasks = [path for _, files in documents for path in files]
+    print(f"Parsing {len(documents)} document(s), {len(tasks)} file(s) on {workers} process(es)"
+          f" with {'orjson' if _loads is not json.loads else 'json'}")
+
+    columns = ["Document", "Shards", "Pages", "Blocks", "Lines", "Words", "Tables"] + FIELDNAMES
+    start = time.perf_counter()
+    written = skipped = failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool, open_report_writer(output, columns) as report:
+        # Futures are read back in task order, so each document's shards are
+        # contiguous and already in page order
+        futures = iter([pool.submit(parse_shard, path) for path in tasks])
+        for name, files in documents:
+            shard_results = []
+            errors = 0
+            for path in files:
+                try:
+                    shard_results.append(next(futures).result())
+                except Exception as e:
+                    errors += 1
+                    print(f"Error parsing {path}: {e}")
+            if errors:
+                failed += 1  # a partial document would give wrong pages and fields
+                continue
+            row = summarize_document(name, shard_results)
+            if not row["Blocks"]:
+                skipped += 1  # JSON that is not Textract output
+                continue
+            report.write_row(row)
+            report.flush()
+            written += 1
+    elapsed = time.perf_counter() - start
+    print(f"Parsed {written} document(s) in {elapsed:.2f}s ({failed} failed,"
+          f" {skipped} without Textract blocks skipped); results saved to {output}")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse stored Textract output in parallel.")
+    parser.add_argument("paths", nargs="+", help="Textract JSON files, shard directories or folders of them")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT, help="report file (.csv, .xlsx or .parquet)")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS, help="worker processes")
+    args = parser.parse_args()
+    bulk_parse(args.paths, args.output, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+
+import sys
+from array import array
+
+from textract_stream import iter_blocks
+
+# ---------------
+# CONFIGURATION
+# ---------------
+NO_VALUE = -1  # stored in the integer columns for a missing RowIndex, Page, ...
+
+
+# ---------------
+# DOCUMENT
+# ---------------
+
+class CompactDocument:
+    """
+    Textract blocks held column by column instead of as a tree of dicts:
+
+      - BlockType, EntityTypes, SelectionStatus and relationship types are
+        interned and stored as small integer codes;
+      - page, confidence, bounding box and cell position live in typed arrays;
+      - relationships are integer offsets into the document (CSR layout:
+        rel_start[i]..rel_start[i + 1] are block i's targets);
+      - polygons are kept as packed floats and only turned into point dicts
+        when a block's Geometry is read.
+
+    Blocks are read through Block views, which answer the dict lookups the
+    rest of the code uses (block['Text'], block.get('Page'), ...), so a
+    CompactDocument can be passed wherever an iterable of blocks is accepted.
+    """
+
+    def __init__(self):
+        self.ids = []
+        self.index_of = {}             # Id -> position
+        self.type_codes = array('B')
+        self.entity_codes = array('B')
+        self.status_codes = array('B')
+        self.pages = array('i')
+        self.texts = []                # shared str objects for repeated words
+        self.confidence = array('f')
+        self.boxes = array('f')        # left, top, width, height per block
+        self.cells = array('i')        # RowIndex, ColumnIndex, RowSpan, ColumnSpan per block
+        self.polygons = array('f')     # x, y, x, y, ... for every block
+        self.polygon_start = array('I', [0])
+        self.rel_start = array('I', [0])
+        self.rel_types = array('B')
+        self.rel_targets = array('i')
+        self.names = {}                # interned string -> code, per kind
+        self.values = {}               # kind -> [string, ...] by code
+        self._pending = []             # (type code, Id) per relationship target until finish()
+
+    def _code(self, kind, value):
+        table = self.names.setdefault(kind, {})
+        if value not in table:
+            table[value] = len(table)
+            self.values.setdefault(kind, []).append(value)
+        return table[value]
+
+    def add_block(self, block):
+        position = len(self.ids)
+        self.ids.append(block['Id'])
+        self.index_of[block['Id']] = position
+        self.type_codes.append(self._code('type', sys.intern(block['BlockType'])))
+        self.entity_codes.append(self._code('entity', tuple(block.get('EntityTypes') or ())))
+        self.status_codes.append(self._code('status', block.get('SelectionStatus')))
+        page = block.get('Page')
+        self.pages.append(NO_VALUE if page is None else page)
+        text = block.get('Text')
+        self.texts.append(None if text is None else self._shared_text(text))
+        confidence = block.get('Confidence')
+        self.confidence.append(float('nan') if confidence is None else confidence)
+        for key in ('RowIndex', 'ColumnIndex', 'RowSpan', 'ColumnSpan'):
+            value = block.get(key)
+            self.cells.append(NO_VALUE if value is None else value)
+
+        geometry = block.get('Geometry') or {}
+        box = geometry.get('BoundingBox')
+        if box:
+            self.boxes.extend((box['Left'], box['Top'], box['Width'], box['Height']))
+        else:
+            self.boxes.extend((float('nan'),) * 4)
+        for point in geometry.get('Polygon') or ():
+            self.polygons.extend((point['X'], point['Y']))
+        self.polygon_start.append(len(self.polygons))
+
+        for relationship in block.get('Relationships') or ():
+            code = self._code('relationship', relationship['Type'])
+            self._pending.extend((code, target) for target in relationship['Ids'])
+        self.rel_start.append(len(self._pending))
+
+    def _shared_text(self, text):
+        # WORD text repeats a lot ("the", "of", "mg"); keep one copy of short strings
+        return sys.intern(text) if len(text) <= 32 else text
+
+    def finish(self):
+        """Turn relationship Ids into block offsets once every block is known."""
+        for code, target in self._pending:
+            self.rel_types.append(code)
+            self.rel_targets.append(self.index_of.get(target, NO_VALUE))
+        self._pending = []
+        return self
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, position):
+        return Block(self, position)
+
+    def __iter__(self):
+        for position in range(len(self.ids)):
+            yield Block(self, position)
+
+    def block(self, block_id):
+        """Return the Block with this Id."""
+        return Block(self, self.index_of[block_id])
+
+    def blocks(self, block_type=None, page=None):
+        """Yield the blocks of one type and/or page."""
+        type_code = self.names.get('type', {}).get(block_type, NO_VALUE) if block_type else None
+        for position in range(len(self.ids)):
+            if type_code is not None and self.type_codes[position] != type_code:
+                continue
+            if page is not None and self.pages[position] != page:
+                continue
+            yield Block(self, position)
+
+
+class Block:
+    """Read-only view of one block of a CompactDocument, usable like its dict."""
+
+    __slots__ = ('doc', 'position')
+
+    KEYS = ('BlockType', 'Id', 'Page', 'Text', 'Confidence', 'EntityTypes', 'SelectionStatus',
+            'RowIndex', 'ColumnIndex', 'RowSpan', 'ColumnSpan', 'Geometry', 'Relationships')
+
+    def __init__(self, doc, position):
+        self.doc = doc
+        self.position = position
+
+    @property
+    def block_type(self):
+        return self.doc.values['type'][self.doc.type_codes[self.position]]
+
+    @property
+    def text(self):
+        return self.doc.texts[self.position]
+
+    @property
+    def page(self):
+        page = self.doc.pages[self.position]
+        return None if page == NO_VALUE else page
+
+    @property
+    def bounding_box(self):
+        left, top, width, height = self.doc.boxes[4 * self.position:4 * self.position + 4]
+        if left != left:  # NaN: no geometry
+            return None
+        return {'Width': width, 'Height': height, 'Left': left, 'Top': top}
+
+    @property
+    def polygon(self):
+        """The polygon points, decoded from the packed floats on each access."""
+        start, end = self.doc.polygon_start[self.position], self.doc.polygon_start[self.position + 1]
+        coords = self.doc.polygons[start:end]
+        return [{'X': coords[i], 'Y': coords[i + 1]} for i in range(0, len(coords), 2)]
+
+    def related(self, relationship_type='CHILD'):
+        """Yield the related blocks of one relationship type."""
+        code = self.doc.names.get('relationship', {}).get(relationship_type)
+        start, end = self.doc.rel_start[self.position], self.doc.rel_start[self.position + 1]
+        for j in range(start, end):
+            if self.doc.rel_types[j] == code and self.doc.rel_targets[j] != NO_VALUE:
+                yield Block(self.doc, self.doc.rel_targets[j])
+
+    def children(self):
+        return list(self.related('CHILD'))
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key, default=None):
+        doc, position = self.doc, self.position
+        if key == 'BlockType':
+            return self.block_type
+        if key == 'Id':
+            return doc.ids[position]
+        if key == 'Page':
+            page = self.page
+            return default if page is None else page
+        if key == 'Text':
+            text = self.text
+            return default if text is None else text
+        if key == 'Confidence':
+            confidence = doc.confidence[position]
+            return default if confidence != confidence else confidence
+        if key == 'EntityTypes':
+            entities = doc.values['entity'][doc.entity_codes[position]]
+            return list(entities) if entities else default
+        if key == 'SelectionStatus':
+            status = doc.values['status'][doc.status_codes[position]]
+            return default if status is None else status
+        if key in ('RowIndex', 'ColumnIndex', 'RowSpan', 'ColumnSpan'):
+            value = doc.cells[4 * position + ('RowIndex', 'ColumnIndex', 'RowSpan', 'ColumnSpan').index(key)]
+            return default if value == NO_VALUE else value
+        if key == 'Geometry':
+            box = self.bounding_box
+            return default if box is None else {'BoundingBox': box, 'Polygon': self.polygon}
+        if key == 'Relationships':
+            return self._relationships() or default
+        return default
+
+    def _relationships(self):
+        doc = self.doc
+        grouped = {}
+        for j in range(doc.rel_start[self.position], doc.rel_start[self.position + 1]):
+            target = doc.rel_targets[j]
+            if target != NO_VALUE:
+                grouped.setdefault(doc.values['relationship'][doc.rel_types[j]], []).append(doc.ids[target])
+        return [{'Type': rel_type, 'Ids': ids} for rel_type, ids in grouped.items()]
+
+    def keys(self):
+        return [key for key in self.KEYS if key in self]
+
+    def to_dict(self):
+        """Return the block as a plain Textract dict."""
+        return {key: self[key] for key in self.keys()}
+
+    def __repr__(self):
+        return f"<Block {self.block_type} page={self.page} {self.text!r}>"
+
+
+_MISSING = object()
+
+
+def load_compact_document(source, block_types=None, pages=None):
+    """
+    Build a CompactDocument from anything textract_stream.iter_blocks
+    accepts (a response, a JSON file, a job's shard directory, ...). Blocks
+    are streamed in, so the dict tree is never held as a whole.
+    Relationships to blocks that are not in the document (filtered out,
+    or missing from the output) are dropped.
+    """
+    document = CompactDocument()
+    for block in iter_blocks(source, block_types=block_types, pages=pages):
+        document.add_block(block)
+    return document.finish()
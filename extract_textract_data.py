@@ -1,22 +1,31 @@
 #!/usr/bin/env python3
 
-import boto3
-import time
-import pandas as pd
-import re
+from field_rules import FieldRule, SectionRule, compile_rules
+from pipeline_metrics import export_metrics, metrics
+from profiling import profile_from_command_line, profiled, profiler, write_profile
+from report_writers import open_report_writer
+from run_journal import RunJournal
+from rate_limiter import limited_client
+from s3_transfer import get_object_bytes, get_s3_client
+from textract_cache import TextractCache, cached_analyze_document, s3_content_id
 
 # ---------------
 # CONFIGURATION
 # ---------------
 BUCKET_NAME = "vascculogic"
 PDF_PREFIX = "pdf/"
-OUTPUT_EXCEL_FILE = "extracted_fields.xlsx"
+OUTPUT_EXCEL_FILE = "extracted_fields.xlsx"  # .xlsx, .csv or .parquet
+JOURNAL_FILE = "extracted_fields.journal.jsonl"  # progress of an interrupted run
+METRICS_FILE = "extracted_fields.prom"  # per-stage metrics, Prometheus textfile format
+TRACE_DIR = "extracted_fields.traces"  # one JSON trace of the stages per PDF
+FEATURE_TYPES = ['TABLES', 'FORMS']
 
 # ---------------
 # AWS CLIENTS
 # ---------------
-s3_client = boto3.client("s3")
-textract_client = boto3.client("textract")
+s3_client = get_s3_client()
+textract_client = limited_client("textract")  # shares the host-wide TPS budget
+textract_cache = TextractCache()
 
 # ---------------
 # FUNCTIONS
@@ -28,30 +37,32 @@ def list_pdfs_in_s3(bucket_name, prefix):
     """
     pdf_keys = []
     paginator = s3_client.get_paginator('list_objects_v2')
-    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
-        if 'Contents' in page:
-            for obj in page['Contents']:
-                key = obj['Key']
-                if key.lower().endswith('.pdf'):
-                    pdf_keys.append(key)
+    with metrics.stage('s3_list'):
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+            if 'Contents' in page:
+                for obj in page['Contents']:
+                    key = obj['Key']
+                    if key.lower().endswith('.pdf'):
+                        pdf_keys.append(key)
     return pdf_keys
 
 def analyze_document_sync(bucket_name, document_key):
     """
     Synchronous call to Textract's analyze_document API.
     Works for documents up to 5 MB in size (passed as Bytes).
+    Responses are cached by the object's ETag and feature set, so a PDF
+    that was already analyzed is neither downloaded nor sent again.
     """
-    # 1) Download the PDF from S3 to memory
-    pdf_obj = s3_client.get_object(Bucket=bucket_name, Key=document_key)
-    file_content = pdf_obj['Body'].read()
+    def download_pdf():
+        # Download the PDF from S3 to memory (only on a cache miss)
+        return {'Bytes': get_object_bytes(s3_client, bucket_name, document_key)}
 
-    # 2) Call Textract analyze_document with TABLES and FORMS features
-    response = textract_client.analyze_document(
-        Document={'Bytes': file_content},
-        FeatureTypes=['TABLES', 'FORMS']
-    )
-    return response
+    # Call Textract analyze_document with TABLES and FORMS features
+    content_id = s3_content_id(s3_client, bucket_name, document_key)
+    return cached_analyze_document(textract_client, textract_cache, content_id,
+                                   FEATURE_TYPES, download_pdf)
 
+@profiled('get_text_from_blocks')
 def get_text_from_blocks(blocks):
     """
     Return a single string of text from all LINE blocks.
@@ -62,16 +73,45 @@ def get_text_from_blocks(blocks):
             text_lines.append(block['Text'])
     return "\n".join(text_lines)
 
+# Field rules, compiled once and evaluated in one pass over the lines of the
+# document. Section 14 runs from "Section 14" to the next "Section 15".
+SECTION_RULES = [
+    SectionRule("14", start=("section", r"Section\s*14"), end=("section", r"Section\s*15")),
+]
+FIELD_RULES = compile_rules([
+    # Black Box warning: Y/N + the text that follows, up to a blank line
+    FieldRule("Black Box warning", ["black box warning"], value="Y"),
+    FieldRule("Black Box text", ["black box warning"], pattern=r"BLACK BOX WARNING.*", until_blank=True),
+
+    # Compound name / approval date. Naive examples; adapt to your actual
+    # PDF patterns, e.g. "Compound Name: X", "Approval Date: <some date>"
+    FieldRule("Compound", ["compound name:"], pattern=r"Compound Name:\s*(.*)"),
+    FieldRule("Approval", ["approval"], pattern=r"Approval\s*Date:\s*(.*)"),
+
+    # Section 14 data (study number, N, dose, efficacy, safety, discontinuation)
+    FieldRule("Study", ["study"], pattern=r"Study\s*Number:\s*(\S+)", multiple=True, section="14"),
+    FieldRule("N for each study", ["="], pattern=r"N\s*=\s*(\S+)", multiple=True, section="14"),
+    FieldRule("Dose for each study", ["dose"], pattern=r"Dose\s*=\s*(\S+)", multiple=True, section="14"),
+    FieldRule("Clinical Efficacy", ["efficacy"], pattern=r"Efficacy\s*=\s*(.*?)(?:;|$)",
+              multiple=True, section="14"),
+    FieldRule("Clinical Safety", ["safety"], pattern=r"Safety\s*=\s*(.*?)(?:;|$)",
+              multiple=True, section="14"),
+    FieldRule("Clinical discontinuation", ["discontinuation"], pattern=r"Discontinuation\s*=\s*(.*?)(?:;|$)",
+              multiple=True, section="14"),
+], sections=SECTION_RULES)
+
+@profiled('extract_fields_from_text')
 def extract_fields_from_text(full_text):
     """
-    Extract fields from the entire PDF text:
+    Extract fields from the entire PDF text (a string, or an iterable of lines):
       - Black Box warning (Y/N + any snippet found)
       - Compound name
       - Approval date
       - Section 14 data (study number, N, dose, efficacy, safety, discontinuation)
+    All fields come from a single pass over the lines (see FIELD_RULES).
     """
     results = {
-        "Black Box warning": None,
+        "Black Box warning": "N",
         "Black Box text": "",
         "Compound": None,
         "Approval": None,
@@ -83,60 +123,8 @@ def extract_fields_from_text(full_text):
         "Clinical discontinuation": []
     }
 
-    # 1) BLACK BOX WARNING
-    if "BLACK BOX WARNING" in full_text.upper():
-        results["Black Box warning"] = "Y"
-        # Attempt to capture text that follows "BLACK BOX WARNING"
-        match = re.search(r'(BLACK BOX WARNING.*?)(\n\n|\Z)', full_text, re.IGNORECASE|re.DOTALL)
-        if match:
-            results["Black Box text"] = match.group(1).strip()
-    else:
-        results["Black Box warning"] = "N"
-
-    # 2) COMPOUND NAME
-    # This is a naive example; adapt to your actual PDF patterns
-    # e.g., if there's a line "Compound Name: X"
-    match = re.search(r'Compound Name:\s*(.*)', full_text, re.IGNORECASE)
-    if match:
-        results["Compound"] = match.group(1).strip()
-
-    # 3) APPROVAL DATE
-    # Similarly naive approach looking for "Approval Date: <some date>"
-    match = re.search(r'Approval\s*Date:\s*(.*)', full_text, re.IGNORECASE)
-    if match:
-        results["Approval"] = match.group(1).strip()
-
-    # 4) SECTION 14 DATA
-    # We search for "Section 14" to the next mention of "Section 15" or end-of-doc
-    section_14_data = ""
-    match_sec14 = re.search(r'(Section\s*14.*?)(?=Section\s*15|$)', full_text, re.IGNORECASE|re.DOTALL)
-    if match_sec14:
-        section_14_data = match_sec14.group(1)
-        # STUDY NUMBER
-        study_nums = re.findall(r'Study\s*Number:\s*(\S+)', section_14_data, re.IGNORECASE)
-        results["Study"].extend(study_nums)
-
-        # N FOR EACH STUDY
-        n_vals = re.findall(r'N\s*=\s*(\S+)', section_14_data, re.IGNORECASE)
-        results["N for each study"].extend(n_vals)
-
-        # DOSE
-        doses = re.findall(r'Dose\s*=\s*(\S+)', section_14_data, re.IGNORECASE)
-        results["Dose for each study"].extend(doses)
-
-        # EFFICACY
-        # Example: "Efficacy=Something"
-        efficacy_matches = re.findall(r'Efficacy\s*=\s*(.*?)(;|\n|$)', section_14_data, re.IGNORECASE)
-        results["Clinical Efficacy"].extend([em[0].strip() for em in efficacy_matches])
-
-        # SAFETY
-        safety_matches = re.findall(r'Safety\s*=\s*(.*?)(;|\n|$)', section_14_data, re.IGNORECASE)
-        results["Clinical Safety"].extend([sm[0].strip() for sm in safety_matches])
-
-        # DISCONTINUATION
-        disc_matches = re.findall(r'Discontinuation\s*=\s*(.*?)(;|\n|$)', section_14_data, re.IGNORECASE)
-        results["Clinical discontinuation"].extend([dm[0].strip() for dm in disc_matches])
-
+    lines = full_text.split("\n") if isinstance(full_text, str) else full_text
+    results.update(FIELD_RULES.extract(lines))
     return results
 
 def process_all_pdfs(bucket_name, prefix):
@@ -145,53 +133,78 @@ def process_all_pdfs(bucket_name, prefix):
     2. For each PDF:
        - Analyze with Textract (sync)
        - Extract text & parse fields
-       - Build a row of data
-    3. Save to Excel
+       - Build a row of data and append it to the report
+    3. Close the report
+
+    Every PDF's progress is checkpointed in JOURNAL_FILE. If the run is
+    interrupted, the next one reuses the rows already extracted and only
+    processes the rest; the journal is removed once every PDF succeeded.
     """
     pdf_keys = list_pdfs_in_s3(bucket_name, prefix)
 
-    all_rows = []
+    journal = RunJournal(JOURNAL_FILE)
+    report = open_report_writer(OUTPUT_EXCEL_FILE)
+    resumed = journal.rows(pdf_keys)
+    if resumed:
+        print(f"Resuming: {len(resumed)} PDF(s) already extracted.")
+        report.write_rows(resumed)
+        report.flush()
+
+    failed = 0
     for pdf_key in pdf_keys:
+        if journal.done(pdf_key):
+            continue
         print(f"Processing {pdf_key} ...")
         try:
-            # 1) Textract
-            response = analyze_document_sync(bucket_name, pdf_key)
-
-            # 2) Extract text
-            blocks = response["Blocks"]
-            full_text = get_text_from_blocks(blocks)
-
-            # 3) Parse fields
-            fields_dict = extract_fields_from_text(full_text)
-
-            # 4) Build row
-            row_data = {
-                "PDF Key": pdf_key,
-                "Black Box Warning (Y/N)": fields_dict["Black Box warning"],
-                "Black Box Text": fields_dict["Black Box text"],
-                "Compound Name": fields_dict["Compound"],
-                "Approval Date": fields_dict["Approval"],
-                "Study Number(s)": ", ".join(fields_dict["Study"]),
-                "N for each study": ", ".join(fields_dict["N for each study"]),
-                "Dose for each study": ", ".join(fields_dict["Dose for each study"]),
-                "Clinical Efficacy": ", ".join(fields_dict["Clinical Efficacy"]),
-                "Clinical Safety": ", ".join(fields_dict["Clinical Safety"]),
-                "Clinical discontinuation": ", ".join(fields_dict["Clinical discontinuation"])
-            }
-            all_rows.append(row_data)
+            with metrics.document(pdf_key), profiler.document(pdf_key):
+                # 1) Textract
+                response = analyze_document_sync(bucket_name, pdf_key)
+                journal.record(pdf_key, "downloaded")
+
+                # 2) Extract text and 3) parse fields
+                with metrics.stage('field_extraction'):
+                    blocks = response["Blocks"]
+                    full_text = get_text_from_blocks(blocks)
+                    fields_dict = extract_fields_from_text(full_text)
+
+                # 4) Build row
+                row_data = {
+                    "PDF Key": pdf_key,
+                    "Black Box Warning (Y/N)": fields_dict["Black Box warning"],
+                    "Black Box Text": fields_dict["Black Box text"],
+                    "Compound Name": fields_dict["Compound"],
+                    "Approval Date": fields_dict["Approval"],
+                    "Study Number(s)": ", ".join(fields_dict["Study"]),
+                    "N for each study": ", ".join(fields_dict["N for each study"]),
+                    "Dose for each study": ", ".join(fields_dict["Dose for each study"]),
+                    "Clinical Efficacy": ", ".join(fields_dict["Clinical Efficacy"]),
+                    "Clinical Safety": ", ".join(fields_dict["Clinical Safety"]),
+                    "Clinical discontinuation": ", ".join(fields_dict["Clinical discontinuation"])
+                }
+                report.write_row(row_data)
+                report.flush()
+                journal.record(pdf_key, "extracted", row=row_data)
 
         except Exception as e:
+            failed += 1
             print(f"Error processing {pdf_key}: {e}")
 
-    # 5) Convert to DataFrame & save to Excel
-    df = pd.DataFrame(all_rows)
-    df.to_excel(OUTPUT_EXCEL_FILE, index=False)
-    print(f"\n=== Finished! {len(all_rows)} PDF(s) processed. ===")
+    # 5) Rows were written as they were extracted; finish the file
+    report.close()
+    if failed:
+        journal.close()
+    else:
+        journal.discard()
+    print(f"\n=== Finished! {report.rows_written} PDF(s) processed. ===")
     print(f"Results saved to: {OUTPUT_EXCEL_FILE}")
+    export_metrics(METRICS_FILE, TRACE_DIR)
 
 # ---------------
 # MAIN
 # ---------------
 if __name__ == "__main__":
+    # --profile[=stage,...] writes CPU and memory reports next to the output
+    profile_from_command_line()
     process_all_pdfs(BUCKET_NAME, PDF_PREFIX)
+    write_profile(OUTPUT_EXCEL_FILE)
 
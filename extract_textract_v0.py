@@ -1,9 +1,14 @@
 #!/usr/bin/env python3
 
 import json
-import csv
 import re
 
+from profiling import profile_from_command_line, profiled, profiler, write_profile
+from report_writers import open_report_writer
+from section_index import SectionIndex, build_section_index
+from spatial_index import HEADER_REGION, SpatialIndex
+from textract_stream import iter_blocks
+
 # The columns you want in your final CSV
 FIELDNAMES = [
     "Black Box Warning",
@@ -18,29 +23,37 @@ FIELDNAMES = [
 ]
 
 def load_textract_json(filename: str):
-    """Load the Textract JSON output into a Python dict."""
+    """
+    Load the Textract JSON output into a Python dict.
+    Prefer passing the filename straight to parse_textract_response, which
+    streams the blocks instead of holding the whole response in memory.
+    """
     with open(filename, "r") as f:
         data = json.load(f)
     return data
 
-def group_text_by_page(textract_data):
+def group_text_by_page(textract_data, section_index=None, spatial_index=None):
     """
     Return a dict of page -> list of lines (strings).
-    Also keep track of the block metadata if needed.
+    `textract_data` can be a decoded response, a path to the JSON file or an
+    open stream; LINE blocks are read one at a time (see textract_stream).
+    If a SectionIndex or SpatialIndex is given, it is built in the same pass;
+    the SpatialIndex only gets page 1, the only page its header lookup reads.
     """
     pages = {}
-    for block in textract_data.get('Blocks', []):
-        block_type = block.get('BlockType')
-        
-        # We only care about lines for a simple approach.
-        if block_type == "LINE":
-            page_number = block.get('Page', 1)
-            text = block.get('Text', "")
-            
-            if page_number not in pages:
-                pages[page_number] = []
-            pages[page_number].append(text)
+    # We only care about lines for a simple approach.
+    for block in iter_blocks(textract_data, block_types=('LINE',)):
+        page_number, text = block.get('Page', 1), block.get('Text', '')
+        if page_number not in pages:
+            pages[page_number] = []
+        pages[page_number].append(text)
+        if section_index is not None:
+            section_index.add_line(page_number, text)
+        if spatial_index is not None and page_number == 1:
+            spatial_index.add_block(block)
     
+    if section_index is not None:
+        section_index.finish()
     return pages
 
 def extract_top_of_first_page_data(lines_page_1):
@@ -49,7 +62,7 @@ def extract_top_of_first_page_data(lines_page_1):
       - Black Box Warning
       - Compound name
       - Approval date
-    from the lines on page 1.
+    from the lines at the top of page 1 (HEADER_REGION, in reading order).
     """
 
     black_box_warning = "N"  # default to No
@@ -91,7 +104,17 @@ def extract_top_of_first_page_data(lines_page_1):
     
     return black_box_warning, compound, approval_date
 
-def extract_section_14_data(all_pages):
+def section_14_pages_text(all_pages):
+    """All lines of the pages that mention 'section 14' or '14 clinical' (fallback)."""
+    section_14_text = []
+    for page_number in sorted(all_pages):
+        lines = all_pages[page_number]
+        text_join = " ".join(lines).lower()
+        if "section 14" in text_join or "14 clinical" in text_join:
+            section_14_text.extend(lines)
+    return section_14_text
+
+def extract_section_14_data(all_pages, section_index=None):
     """
     For fields that appear in "section 14":
       - Study number
@@ -101,9 +124,10 @@ def extract_section_14_data(all_pages):
       - Clinical Safety
       - Clinical Discontinuation
     
-    We must figure out which *page(s)* contain Section 14. 
-    Maybe we search all pages for 'SECTION 14' or '14 CLINICAL STUDIES', 
-    then parse from there on. We’ll do a simplistic example.
+    Section 14 runs from the '14 CLINICAL STUDIES' heading to the next
+    section heading; its lines come from the document's SectionIndex
+    (built here if not given) instead of rescanning every page. When the
+    index has no Section 14, every page mentioning it is used as before.
     """
 
     study_number = ""
@@ -113,20 +137,14 @@ def extract_section_14_data(all_pages):
     clinical_safety = ""
     clinical_discontinuation = ""
 
-    # 1) Identify which pages belong to "Section 14"
-    section_14_pages = []
-    for page_number, lines in all_pages.items():
-        # if we see "14 CLINICAL STUDIES" or something like that
-        # add that page to our list
-        text_join = " ".join(lines).lower()
-        if "section 14" in text_join or "14 clinical" in text_join:
-            section_14_pages.append(page_number)
+    # 1) Take only the lines of Section 14 from the index
+    if section_index is None:
+        section_index = build_section_index(all_pages)
+    section_14_text = section_index.lines(all_pages, 14)
+    if not section_14_text:
+        section_14_text = section_14_pages_text(all_pages)
     
-    # 2) Gather text in those pages
-    # For simplicity, we’ll combine them all into one big text chunk
-    section_14_text = []
-    for p in section_14_pages:
-        section_14_text.extend(all_pages[p])
+    # 2) For simplicity, we’ll combine them into one text chunk
     combined_14_text = "\n".join(section_14_text).lower()
     
     # 3) Use your heuristics to find each piece of data
@@ -164,6 +182,7 @@ def extract_section_14_data(all_pages):
     return (study_number, n_each_study, dose_each_study,
             clinical_efficacy, clinical_safety, clinical_discontinuation)
 
+@profiled('parse_textract_response')
 def parse_textract_response(textract_data):
     """
     Overall function:
@@ -173,8 +192,11 @@ def parse_textract_response(textract_data):
       4) Return a dict that matches FIELDNAMES.
     """
 
-    # Group text by page
-    pages = group_text_by_page(textract_data)
+    # Group text by page, indexing the section headings and the line
+    # geometry in the same pass
+    section_index = SectionIndex()
+    spatial_index = SpatialIndex()
+    pages = group_text_by_page(textract_data, section_index, spatial_index)
     
     # Default dictionary
     parsed_data = {
@@ -189,9 +211,10 @@ def parse_textract_response(textract_data):
         "Clinical Discontinuation": ""
     }
     
-    # 1) Extract top-of-page-1 data (if it exists)
-    page_1_lines = pages.get(1, [])
-    (bb_warn, compound, approval_date) = extract_top_of_first_page_data(page_1_lines)
+    # 1) Extract top-of-page-1 data (if it exists), reading only the header
+    #    region of the page, column by column
+    header_lines = spatial_index.page(1).texts(HEADER_REGION)
+    (bb_warn, compound, approval_date) = extract_top_of_first_page_data(header_lines)
     
     parsed_data["Black Box Warning"] = bb_warn
     parsed_data["Compound"] = compound
@@ -203,7 +226,7 @@ def parse_textract_response(textract_data):
      dose_each_study,
      clin_eff,
      clin_safe,
-     clin_disc) = extract_section_14_data(pages)
+     clin_disc) = extract_section_14_data(pages, section_index)
 
     parsed_data["Study"] = study_number
     parsed_data["N for each study"] = n_each_study
@@ -215,20 +238,20 @@ def parse_textract_response(textract_data):
     return parsed_data
 
 def main():
-    # 1) Load the Textract JSON
-    textract_data = load_textract_json("output.json")
-    
-    # 2) Parse
-    row_data = parse_textract_response(textract_data)
+    # --profile writes CPU and memory reports next to the CSV
+    profile_from_command_line()
+
+    # 1) Parse, streaming the Textract JSON straight from disk
+    with profiler.document("output.json"):
+        row_data = parse_textract_response("output.json")
     
-    # 3) Write to CSV
+    # 2) Write to CSV
     csv_filename = "extracted_data.csv"
-    with open(csv_filename, mode="w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
-        writer.writeheader()
-        writer.writerow(row_data)
+    with open_report_writer(csv_filename, FIELDNAMES) as writer:
+        writer.write_row(row_data)
     
     print(f"Data extracted and written to {csv_filename}")
+    write_profile(csv_filename)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+import re
+from collections import namedtuple
+
+# ---------------
+# RULE TYPES
+# ---------------
+
+# One extracted field.
+#   keywords    literal strings (case-insensitive); a line is only looked at by
+#               this rule when it contains at least one of them
+#   pattern     optional regex run on candidate lines; group 1 (or the whole
+#               match) is the value
+#   value       constant value when there is no pattern (e.g. "Y")
+#   requires    literals that must all appear on the line as well
+#   multiple    collect every match (like re.findall) instead of the first
+#   section     only look inside this SectionRule's span
+#   until_blank the value continues over the following lines up to a blank one
+FieldRule = namedtuple(
+    'FieldRule',
+    'field keywords pattern value requires multiple section until_blank',
+    defaults=(None, None, (), False, None, False)
+)
+
+# A span of the document, from the first `start` match to the next `end`
+# match. `start`/`end` are (keyword, pattern) pairs like the rules above.
+SectionRule = namedtuple('SectionRule', 'name start end', defaults=(None,))
+
+
+# ---------------
+# ENGINE
+# ---------------
+
+class FieldExtractor:
+    """
+    A set of FieldRules compiled once and evaluated in a single pass over
+    the document's lines.
+
+    All keywords are folded into one compiled alternation, so each line is
+    scanned once regardless of how many rules there are; the per-rule
+    regexes only run on the lines that contain one of their keywords.
+    First-match rules are skipped once satisfied.
+    """
+
+    def __init__(self, rules, sections=()):
+        self.rules = list(rules)
+        self.sections = list(sections)
+
+        keywords = set()
+        for rule in self.rules:
+            keywords.update(k.lower() for k in rule.keywords)
+        for section in self.sections:
+            for marker in (section.start, section.end):
+                if marker:
+                    keywords.add(marker[0].lower())
+
+        # Longest first so that, at a given position, "study number:" wins
+        # over "study"; the shorter keywords that are prefixes of a match are
+        # added back through `self.prefixes`. The lookahead finds
+        # overlapping matches at every position.
+        ordered = sorted(keywords, key=len, reverse=True)
+        alternation = "|".join(re.escape(k) for k in ordered)
+        self.scanner = re.compile(f"(?=({alternation}))", re.IGNORECASE) if ordered else None
+        self.prefixes = {k: {p for p in keywords if k.startswith(p)} for k in keywords}
+
+        self.by_keyword = {k: [] for k in keywords}
+        for index, rule in enumerate(self.rules):
+            for k in rule.keywords:
+                self.by_keyword[k.lower()].append(index)
+
+        self.patterns = [re.compile(r.pattern, re.IGNORECASE) if r.pattern else None for r in self.rules]
+        self.section_patterns = {
+            s.name: tuple(
+                (m[0].lower(), re.compile(m[1], re.IGNORECASE)) if m else None
+                for m in (s.start, s.end)
+            )
+            for s in self.sections
+        }
+
+    def _scan(self, line):
+        """Return the set of keywords present on the line."""
+        found = set()
+        if self.scanner is not None:
+            for match in self.scanner.finditer(line):
+                found.update(self.prefixes[match.group(1).lower()])
+        return found
+
+    def _section_segments(self, line, keywords, state):
+        """Return {section name: part of this line inside the section}."""
+        segments = {}
+        for name, (start, end) in self.section_patterns.items():
+            offset = 0
+            end_from = 0
+            if state[name] == 'before':
+                if start[0] not in keywords:
+                    continue
+                match = start[1].search(line)
+                if not match:
+                    continue
+                state[name] = 'inside'
+                offset = match.start()
+                end_from = match.end()
+            if state[name] != 'inside':
+                continue
+            segment = line[offset:]
+            if end is not None and end[0] in keywords:
+                match = end[1].search(line, end_from)
+                if match:
+                    segment = line[offset:match.start()]
+                    state[name] = 'after'
+            segments[name] = segment
+        return segments
+
+    def extract(self, lines):
+        """
+        Evaluate every rule over `lines` (any iterable of strings, read once).
+        Returns {field: value} for the fields that were found; `multiple`
+        rules give a list.
+        """
+        found = {}
+        state = {name: 'before' for name in self.section_patterns}
+        capturing = []  # [field, collected lines] for until_blank rules
+
+        for line in lines:
+            for capture in list(capturing):
+                if not line.strip():
+                    found[capture[0]] = "\n".join(capture[1]).strip()
+                    capturing.remove(capture)
+                else:
+                    capture[1].append(line)
+
+            keywords = self._scan(line)
+            segments = self._section_segments(line, keywords, state) if self.sections else {}
+            if not keywords:
+                continue
+
+            candidates = sorted({i for k in keywords for i in self.by_keyword.get(k, ())})
+            for index in candidates:
+                rule = self.rules[index]
+                if not rule.multiple and rule.field in found:
+                    continue
+                text = line if rule.section is None else segments.get(rule.section)
+                if not text:
+                    continue
+                lowered = text.lower()
+                if rule.requires and not all(r.lower() in lowered for r in rule.requires):
+                    continue
+
+                pattern = self.patterns[index]
+                if pattern is None:
+                    if any(k.lower() in lowered for k in rule.keywords):
+                        found[rule.field] = rule.value
+                    continue
+
+                if rule.multiple:
+                    values = [_match_value(m) for m in pattern.finditer(text)]
+                    if values:
+                        found.setdefault(rule.field, []).extend(values)
+                    continue
+
+                match = pattern.search(text)
+                if not match:
+                    continue
+                if rule.until_blank:
+                    capturing.append([rule.field, [match.group(0)]])
+                    found[rule.field] = match.group(0).strip()
+                else:
+                    found[rule.field] = _match_value(match)
+
+        for field, collected in capturing:
+            found[field] = "\n".join(collected).strip()
+        return found
+
+
+def _match_value(match):
+    return (match.group(1) if match.re.groups else match.group(0)).strip()
+
+
+def compile_rules(rules, sections=()):
+    """Compile a list of FieldRules (and SectionRules) into a FieldExtractor."""
+    return FieldExtractor(rules, sections)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+import re
+from collections import namedtuple
+
+from textract_stream import iter_blocks
+
+# ---------------
+# CONFIGURATION
+# ---------------
+FORM_BLOCK_TYPES = ('KEY_VALUE_SET', 'WORD', 'SELECTION_ELEMENT')
+
+# A resolved form field. `confidence` is the lower of the KEY and VALUE
+# block confidences, so one poorly read side marks the pair as doubtful.
+FormField = namedtuple('FormField', 'value confidence')
+
+
+# ---------------
+# FUNCTIONS
+# ---------------
+
+def normalize_key(text):
+    """'Initial U.S. Approval:' -> 'initial u.s. approval'"""
+    return re.sub(r"\s+", " ", text).strip().rstrip(":").strip().lower()
+
+
+class FormBuilder:
+    """
+    Collects KEY_VALUE_SET blocks and their words (fed with add_block(), in
+    any order) and resolves KEY -> VALUE -> CHILD through Id maps once the
+    document has been read: every block is stored once and every
+    relationship followed once, so the cost is linear in the block count.
+    """
+
+    def __init__(self):
+        self.words = {}   # WORD / SELECTION_ELEMENT Id -> text
+        self.keys = []    # (page, confidence, child Ids, value Ids)
+        self.values = {}  # VALUE Id -> (confidence, child Ids)
+
+    def add_block(self, block):
+        block_type = block['BlockType']
+        if block_type == 'WORD':
+            self.words[block['Id']] = block.get('Text', '')
+        elif block_type == 'SELECTION_ELEMENT':
+            self.words[block['Id']] = block.get('SelectionStatus', '')
+        elif block_type == 'KEY_VALUE_SET':
+            children, values = [], []
+            for relationship in block.get('Relationships') or ():
+                if relationship['Type'] == 'CHILD':
+                    children.extend(relationship['Ids'])
+                elif relationship['Type'] == 'VALUE':
+                    values.extend(relationship['Ids'])
+            confidence = block.get('Confidence', 0.0)
+            if 'KEY' in (block.get('EntityTypes') or ()):
+                self.keys.append((block.get('Page', 1), confidence, children, values))
+            else:
+                self.values[block['Id']] = (confidence, children)
+
+    def _text(self, child_ids):
+        return " ".join(t for t in (self.words.get(i, '') for i in child_ids) if t)
+
+    def fields(self):
+        """
+        Return {page: {normalized key: FormField(value, confidence)}}.
+        When a key appears more than once on a page, the most confident
+        pair is kept.
+        """
+        pages = {}
+        for page, key_confidence, children, value_ids in self.keys:
+            key = normalize_key(self._text(children))
+            if not key:
+                continue
+            parts = []
+            confidence = key_confidence
+            for value_id in value_ids:
+                if value_id in self.values:
+                    value_confidence, value_children = self.values[value_id]
+                    parts.append(self._text(value_children))
+                    confidence = min(confidence, value_confidence)
+            field = FormField(" ".join(p for p in parts if p), confidence)
+            page_fields = pages.setdefault(page, {})
+            if key not in page_fields or field.confidence > page_fields[key].confidence:
+                page_fields[key] = field
+        return pages
+
+
+def extract_form_fields(source, pages=None):
+    """Return FormBuilder.fields() for anything textract_stream.iter_blocks accepts."""
+    builder = FormBuilder()
+    for block in iter_blocks(source, block_types=FORM_BLOCK_TYPES, pages=pages):
+        builder.add_block(block)
+    return builder.fields()
+
+
+def find_field(fields, key, min_confidence=0.0):
+    """Return the first FormField for `key` in page order, or None."""
+    key = normalize_key(key)
+    for page in sorted(fields):
+        field = fields[page].get(key)
+        if field is not None and field.confidence >= min_confidence:
+            return field
+    return None
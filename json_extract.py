@@ -1,17 +1,14 @@
-import pandas as pd
+from block_table import load_block_table
 
-# Load the existing Excel file
-input_excel = 'textract_results.xlsx'
+# Load the LINE and WORD blocks straight from the Textract JSON, in block order
+input_json = 'textract_output.json'
+blocks = load_block_table(input_json, block_types=('LINE', 'WORD'))
 
-# Read the Excel file into a DataFrame
-df = pd.read_excel(input_excel)
+# Select only the text and confidence columns
+filtered_df = blocks[['text', 'confidence']].rename(columns={'text': 'Text', 'confidence': 'Confidence'})
 
-# Select only the first two columns
-filtered_df = df[['Text', 'Confidence']]
-
-# Save the refined data back to a new Excel file
+# Save the refined data to a new Excel file
 output_excel = 'filtered_textract_results_VO.xlsx'
 filtered_df.to_excel(output_excel, index=False)
 
 print(f"Filtered data saved to {output_excel}")
-
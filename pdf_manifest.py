@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from pipeline_metrics import metrics
+
+# ---------------
+# CONFIGURATION
+# ---------------
+LIST_WORKERS = 8  # sub-prefixes listed in parallel
+
+
+# ---------------
+# FUNCTIONS
+# ---------------
+
+def _paginate(s3_client, bucket, prefix, delimiter=None):
+    paginator = s3_client.get_paginator('list_objects_v2')
+    params = {'Bucket': bucket, 'Prefix': prefix}
+    if delimiter:
+        params['Delimiter'] = delimiter
+    return paginator.paginate(**params)
+
+
+def list_pdf_objects(s3_client, bucket, prefix, workers=LIST_WORKERS):
+    """
+    Return {key: {'ETag': ..., 'Size': ...}} for every PDF under `prefix`.
+    Every listing is paginated, so there is no 1000-key limit. The first
+    level of sub-prefixes is discovered with a delimiter listing and then
+    listed in parallel.
+    """
+    def list_sub_prefix(sub_prefix):
+        found = []
+        for page in _paginate(s3_client, bucket, sub_prefix):
+            found.extend(page.get('Contents', []))
+        return found
+
+    with metrics.stage('s3_list'):
+        objects = []
+        sub_prefixes = []
+        for page in _paginate(s3_client, bucket, prefix, delimiter='/'):
+            objects.extend(page.get('Contents', []))
+            sub_prefixes.extend(p['Prefix'] for p in page.get('CommonPrefixes', []))
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for found in pool.map(list_sub_prefix, sub_prefixes):
+                objects.extend(found)
+    metrics.count('s3_objects_listed', len(objects))
+
+    return {
+        obj['Key']: {'ETag': obj['ETag'].strip('"'), 'Size': obj['Size']}
+        for obj in objects
+        if obj['Key'].lower().endswith('.pdf')
+    }
+
+
+def load_manifest(manifest_path):
+    """Return the manifest saved by the last run ({} if there is none)."""
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest_path, manifest):
+    partial_path = f"{manifest_path}.part"
+    with open(partial_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(partial_path, manifest_path)
+
+
+def diff_manifest(current, previous, with_rows=False):
+    """
+    Return the keys in `current` that are new or whose ETag/size changed.
+    With `with_rows`, keys recorded without a report row (by an older
+    manifest) count as changed too, so the report can be rebuilt.
+    """
+    changed = []
+    for key, entry in current.items():
+        seen = previous.get(key)
+        if (seen is None or seen.get('ETag') != entry['ETag'] or seen.get('Size') != entry['Size']
+                or (with_rows and 'Row' not in seen)):
+            changed.append(key)
+    return sorted(changed)
+
+
+def list_changed_pdfs(s3_client, bucket, prefix, manifest_path, with_rows=False):
+    """
+    List the PDFs under `prefix` and return (changed_keys, current_listing),
+    where changed_keys are the PDFs not yet recorded in the manifest with
+    the same ETag and size. Pass current_listing to record_processed once
+    the keys have been handled. Scripts that rewrite a full report pass
+    with_rows=True and take the unchanged PDFs' rows from stored_rows().
+    """
+    current = list_pdf_objects(s3_client, bucket, prefix)
+    return diff_manifest(current, load_manifest(manifest_path), with_rows), current
+
+
+def record_processed(manifest_path, current, processed_keys, rows=None):
+    """
+    Add the successfully processed keys to the manifest so the next run
+    skips them, with each key's report row from `rows` ({key: row}) if given.
+    """
+    manifest = load_manifest(manifest_path)
+    for key in processed_keys:
+        manifest[key] = dict(current[key])
+        if rows and key in rows:
+            manifest[key]['Row'] = rows[key]
+    save_manifest(manifest_path, manifest)
+
+
+def stored_rows(manifest_path, keys):
+    """Return the report rows recorded for `keys` (in that order), skipping keys without one."""
+    manifest = load_manifest(manifest_path)
+    return [manifest[key]['Row'] for key in keys if 'Row' in manifest.get(key, {})]
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+
+import io
+import re
+
+import pikepdf
+
+from pipeline_metrics import metrics
+
+# ---------------
+# CONFIGURATION
+# ---------------
+MIN_TEXT_CHARS = 40  # below this a page is treated as having no usable text layer
+# Headings are matched with all whitespace removed, since some PDFs draw
+# every glyph separately and the extracted text comes out as "1 4 C L I ..."
+SECTION_14_HEADING = re.compile(r"14CLINICALSTUDIES")
+NEXT_SECTION_HEADING = re.compile(r"1[5-7](REFERENCES|HOWSUPPLIED|PATIENTCOUNSELING)")
+# A label's table of contents runs from its CONTENTS banner up to the next
+# mention of the full prescribing information (usually its banner)
+CONTENTS_HEADING = re.compile(r"FULLPRESCRIBINGINFORMATION:CONTENTS")
+FULL_PRESCRIBING_INFORMATION = re.compile(r"FULLPRESCRIBINGINFORMATION(?!:CONTENTS)")
+TEXT_OPERATORS = {"Tj", "TJ", "'", '"'}
+
+
+# ---------------
+# FUNCTIONS
+# ---------------
+
+def _open_pdf(pdf):
+    if isinstance(pdf, pikepdf.Pdf):
+        return pdf
+    if isinstance(pdf, (bytes, bytearray)):
+        return pikepdf.Pdf.open(io.BytesIO(pdf))
+    return pikepdf.Pdf.open(pdf)
+
+
+_HEX = re.compile(rb"<([0-9A-Fa-f]+)>")
+
+
+def _parse_to_unicode(cmap_bytes):
+    """Return {code: text} from a ToUnicode CMap (bfchar and bfrange entries)."""
+    mapping = {}
+    for block in re.findall(rb"beginbfchar(.*?)endbfchar", cmap_bytes, re.DOTALL):
+        codes = _HEX.findall(block)
+        for src, dst in zip(codes[0::2], codes[1::2]):
+            mapping[int(src, 16)] = bytes.fromhex(dst.decode()).decode("utf-16-be", "ignore")
+    for block in re.findall(rb"beginbfrange(.*?)endbfrange", cmap_bytes, re.DOTALL):
+        for line in block.splitlines():
+            codes = _HEX.findall(line)
+            if len(codes) < 3:
+                continue
+            low, high = int(codes[0], 16), int(codes[1], 16)
+            if b"[" in line:
+                # <lo> <hi> [<dst> <dst> ...]: one destination per code
+                for offset, dst in enumerate(codes[2:2 + high - low + 1]):
+                    mapping[low + offset] = bytes.fromhex(dst.decode()).decode("utf-16-be", "ignore")
+            else:
+                start = int(codes[2], 16)
+                width = len(codes[2]) // 2
+                for offset in range(high - low + 1):
+                    value = (start + offset).to_bytes(width, "big")
+                    mapping[low + offset] = value.decode("utf-16-be", "ignore")
+    return mapping
+
+
+def _font_decoders(page):
+    """Return {font resource name: function(bytes) -> str} for a page's fonts."""
+    decoders = {}
+    fonts = page.obj.get("/Resources", {}).get("/Font", {})
+    for name, font in fonts.items():
+        mapping = {}
+        if "/ToUnicode" in font:
+            mapping = _parse_to_unicode(font.ToUnicode.read_bytes())
+        width = 2 if font.get("/Subtype") == "/Type0" else 1
+
+        def decode(data, mapping=mapping, width=width):
+            if not mapping:
+                return data.decode("latin-1")
+            codes = (int.from_bytes(data[i:i + width], "big") for i in range(0, len(data), width))
+            return "".join(mapping.get(code, "") for code in codes)
+
+        decoders[str(name)] = decode
+    return decoders
+
+
+def page_text(page):
+    """
+    Best-effort text of one page from the operands of its text-showing
+    operators, decoded through each font's ToUnicode map when it has one.
+    Text drawn inside form XObjects is not seen, which only makes the
+    preflight fall back to sending more pages.
+    """
+    decoders = _font_decoders(page)
+    decode = lambda data: data.decode("latin-1")
+    parts = []
+    for operands, operator in pikepdf.parse_content_stream(page, "Tf " + " ".join(TEXT_OPERATORS)):
+        if str(operator) == "Tf":
+            decode = decoders.get(str(operands[0]), decode)
+            continue
+        for operand in operands:
+            items = operand if isinstance(operand, pikepdf.Array) else [operand]
+            for item in items:
+                if isinstance(item, pikepdf.String):
+                    parts.append(decode(bytes(item)))
+        parts.append(" ")
+    return re.sub(r"\s+", " ", "".join(parts))
+
+
+def page_texts(pdf):
+    """Return the embedded text of every page (index 0 = page 1)."""
+    return [page_text(page) for page in _open_pdf(pdf).pages]
+
+
+def has_text_layer(text):
+    return len(text.strip()) >= MIN_TEXT_CHARS
+
+
+def select_pages(texts):
+    """
+    Return the 1-based pages the extractors need: page 1 and the pages of
+    every Section 14, from each '14 CLINICAL STUDIES' heading up to the
+    page where section 15/16/17 starts, so a file with several labels keeps
+    all of them. Headings inside a table of contents are skipped, as in
+    SectionIndex; if every heading is in one (no banner after it), the
+    last heading is used.
+    Returns None when the text layer is missing or Section 14 is not found,
+    meaning the whole document must be sent.
+    """
+    if not texts or not any(has_text_layer(t) for t in texts):
+        return None
+
+    compact = [re.sub(r"\s+", "", text).upper() for text in texts]
+    # Headings in document order as (page index, offset in the page text)
+    headings, ends = [], []
+    in_contents = False
+    markers = [(CONTENTS_HEADING, 'contents'), (FULL_PRESCRIBING_INFORMATION, 'banner'),
+               (SECTION_14_HEADING, 'start'), (NEXT_SECTION_HEADING, 'end')]
+    for index, text in enumerate(compact):
+        found = sorted((match.start(), kind) for pattern, kind in markers for match in pattern.finditer(text))
+        for offset, kind in found:
+            if kind == 'contents':
+                in_contents = True
+            elif kind == 'banner':
+                in_contents = False
+            elif kind == 'start':
+                headings.append((index, offset, in_contents))
+            else:
+                ends.append((index, offset))
+    starts = [(index, offset) for index, offset, listed in headings if not listed]
+    if not starts and headings:
+        starts = [headings[-1][:2]]
+    if not starts:
+        return None
+
+    selected = {1}
+    for start in starts:
+        # The next section may start part-way down a page; stop after that page
+        end = next((end for end in ends if end > start), (len(compact) - 1, 0))
+        selected.update(range(start[0] + 1, end[0] + 2))
+    return sorted(selected)
+
+
+def build_targeted_pdf(pdf):
+    """
+    Split out the pages that matter into a new PDF.
+    Returns (pdf_bytes, page_map) where page_map[i] is the original page
+    number of page i + 1 in the reduced PDF, or (None, None) when the whole
+    document should be submitted.
+    """
+    source = _open_pdf(pdf)
+    pages = select_pages(page_texts(source))
+    if pages is None or len(pages) == len(source.pages):
+        return None, None
+
+    reduced = pikepdf.Pdf.new()
+    for page_number in pages:
+        reduced.pages.append(source.pages[page_number - 1])
+    out = io.BytesIO()
+    reduced.save(out)
+    return out.getvalue(), pages
+
+
+def remap_block_pages(blocks, page_map):
+    """Yield blocks with `Page` mapped back to the original document's numbering."""
+    for block in blocks:
+        if 'Page' in block:
+            block['Page'] = page_map[block['Page'] - 1]
+        yield block
+
+
+def upload_targeted_pdf(s3_client, pdf_bytes, bucket, key, targeted_prefix):
+    """
+    Build the reduced PDF for s3://bucket/key and upload it under
+    `targeted_prefix`. Returns (key_to_submit, page_map); page_map is None
+    when the original document is submitted unchanged.
+    """
+    reduced_bytes, page_map = build_targeted_pdf(pdf_bytes)
+    if reduced_bytes is None:
+        return key, None
+    targeted_key = f"{targeted_prefix.rstrip('/')}/{key}"
+    with metrics.stage('s3_put') as span:
+        s3_client.put_object(Bucket=bucket, Key=targeted_key, Body=reduced_bytes,
+                             ContentType="application/pdf")
+        span.add_bytes(len(reduced_bytes))
+    return targeted_key, page_map
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+
+import bisect
+import contextlib
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ---------------
+# CONFIGURATION
+# ---------------
+PREFIX = "textract_pipeline"
+# Histogram buckets in seconds; Textract jobs sit in the queue for minutes
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+METRICS_PORT = 9464
+
+# Which resource each stage waits on, for summary()
+STAGE_GROUPS = {
+    's3_list': 's3', 's3_get': 's3', 's3_put': 's3',
+    'textract_submit': 'textract', 'textract_analyze': 'textract', 'queue_wait': 'textract',
+    'result_fetch': 'textract',
+    'json_parse': 'cpu', 'field_extraction': 'cpu', 'report_write': 'cpu',
+}
+
+
+# ---------------
+# METRICS
+# ---------------
+
+class Span:
+    """One timed stage in progress; add_bytes() for data it moved."""
+
+    __slots__ = ('stage', 'document', 'start', 'children', 'bytes', 'error')
+
+    def __init__(self, stage, document):
+        self.stage = stage
+        self.document = document
+        self.start = time.time()
+        self.children = 0.0  # time spent in stages nested inside this one
+        self.bytes = 0
+        self.error = False
+
+    def add_bytes(self, count):
+        self.bytes += count
+
+
+class PipelineMetrics:
+    """
+    Per-stage pipeline metrics: counters, a latency histogram and a byte
+    counter per stage, and a trace of the stages each document went through.
+
+        with metrics.document(pdf_key):
+            with metrics.stage('s3_get') as span:
+                data = ...
+                span.add_bytes(len(data))
+
+    Stages nest; each records its own time without the stages inside it,
+    so the histograms add up to where the time actually went (S3, Textract
+    or local CPU). The document is taken from the enclosing document()
+    block on the same thread unless given explicitly.
+
+    Export with write_prometheus() (node_exporter textfile format), serve()
+    (an HTTP /metrics endpoint) and write_traces() (one JSON file per
+    document). Safe to share between threads.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.histograms = {}        # stage -> [count per bucket..., +Inf count, sum, count]
+        self.bytes = Counter()      # stage -> bytes moved
+        self.errors = Counter()     # stage -> spans that raised
+        self.counters = Counter()   # (name, sorted label items) -> value
+        self.traces = {}            # document -> [span dict, ...]
+
+    # Recording
+
+    def _stack(self):
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    @contextlib.contextmanager
+    def document(self, document):
+        """Attribute the stages run on this thread inside the block to `document`."""
+        previous = getattr(self.local, 'document', None)
+        self.local.document = document
+        try:
+            yield
+        finally:
+            self.local.document = previous
+
+    def current_document(self):
+        return getattr(self.local, 'document', None)
+
+    @contextlib.contextmanager
+    def stage(self, stage, document=None):
+        """Time the block as `stage`; yields the Span. Do not yield from a generator inside it."""
+        span = Span(stage, document or self.current_document())
+        stack = self._stack()
+        stack.append(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException:
+            span.error = True
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            stack.pop()
+            if stack:
+                stack[-1].children += seconds
+            self._record(span, seconds, seconds - span.children)
+
+    def observe(self, stage, seconds, document=None, bytes_moved=0):
+        """Record a stage timed elsewhere, e.g. the wait between submit and completion."""
+        span = Span(stage, document or self.current_document())
+        span.start -= seconds
+        span.bytes = bytes_moved
+        self._record(span, seconds, seconds)
+
+    def timed_iter(self, iterable, stage, document=None, bytes_moved=0):
+        """
+        Yield from `iterable`, timing only the work done inside it (not the
+        consumer's), and record it as one `stage` when it is exhausted.
+        For generators such as the streaming JSON parser.
+        """
+        span = Span(stage, document or self.current_document())
+        span.bytes = bytes_moved
+        iterator = iter(iterable)
+        stack = self._stack()
+        clock = time.perf_counter
+        total = 0.0
+        try:
+            while True:
+                start = clock()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    total += clock() - start
+                    return
+                elapsed = clock() - start
+                total += elapsed
+                if stack:
+                    stack[-1].children += elapsed
+                yield item
+        finally:
+            self._record(span, total, total)
+
+    def count(self, name, amount=1, **labels):
+        """Add to the counter `name` with these labels."""
+        with self.lock:
+            self.counters[(name, tuple(sorted(labels.items())))] += amount
+
+    def _record(self, span, seconds, self_seconds):
+        with self.lock:
+            histogram = self.histograms.get(span.stage)
+            if histogram is None:
+                histogram = self.histograms[span.stage] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            histogram[bisect.bisect_left(self.buckets, self_seconds)] += 1
+            histogram[-2] += self_seconds
+            histogram[-1] += 1
+            if span.bytes:
+                self.bytes[span.stage] += span.bytes
+            if span.error:
+                self.errors[span.stage] += 1
+            if span.document is not None:
+                self.traces.setdefault(span.document, []).append({
+                    'stage': span.stage,
+                    'start': round(span.start, 6),
+                    'seconds': round(seconds, 6),
+                    'self_seconds': round(self_seconds, 6),
+                    'bytes': span.bytes,
+                    'error': span.error,
+                })
+
+    # Export
+
+    def summary(self):
+        """Return {stage: (count, seconds, bytes)} and print where the time went."""
+        with self.lock:
+            stages = {stage: (h[-1], h[-2], self.bytes[stage]) for stage, h in self.histograms.items()}
+        total = sum(seconds for _, seconds, _ in stages.values()) or 1.0
+        groups = Counter()
+        for stage, (count, seconds, moved) in sorted(stages.items()):
+            groups[STAGE_GROUPS.get(stage, 'other')] += seconds
+            print(f"  {stage:<18} {count:>7} x  {seconds:10.2f}s  {moved / 1024 ** 2:10.1f} MB")
+        print("  Time by resource: " + ", ".join(f"{group} {seconds / total:.0%}"
+                                                  for group, seconds in groups.most_common()))
+        return stages
+
+    def prometheus_text(self):
+        """The metrics in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            histograms = {stage: list(h) for stage, h in self.histograms.items()}
+            moved = dict(self.bytes)
+            errors = dict(self.errors)
+            counters = dict(self.counters)
+
+        name = f"{PREFIX}_stage_seconds"
+        lines.append(f"# HELP {name} Time spent in each pipeline stage, excluding nested stages.")
+        lines.append(f"# TYPE {name} histogram")
+        for stage, histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), histogram):
+                cumulative += count
+                le = "+Inf" if bound == float('inf') else repr(bound)
+                lines.append(f'{name}_bucket{{stage="{_escape(stage)}",le="{le}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{_escape(stage)}"}} {histogram[-2]}')
+            lines.append(f'{name}_count{{stage="{_escape(stage)}"}} {histogram[-1]}')
+
+        for metric, values, help_text in (
+                ("bytes_total", moved, "Bytes moved by each pipeline stage."),
+                ("stage_errors_total", errors, "Pipeline stages that raised an error.")):
+            lines.append(f"# HELP {PREFIX}_{metric} {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{metric} counter")
+            for stage, value in sorted(values.items()):
+                lines.append(f'{PREFIX}_{metric}{{stage="{_escape(stage)}"}} {value}')
+
+        typed = set()
+        for (counter, labels), value in sorted(counters.items()):
+            metric = f"{PREFIX}_{_metric_name(counter)}_total"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            label_text = ",".join(f'{_metric_name(k)}="{_escape(v)}"' for k, v in labels)
+            lines.append(f"{metric}{{{label_text}}} {value}" if label_text else f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Write the metrics for node_exporter's textfile collector (atomically)."""
+        partial_path = f"{path}.part"
+        with open(partial_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(partial_path, path)
+
+    def write_traces(self, directory):
+        """Write one <document>.trace.json per document into `directory`; return the count."""
+        os.makedirs(directory, exist_ok=True)
+        with self.lock:
+            traces = {document: list(spans) for document, spans in self.traces.items()}
+        for document, spans in traces.items():
+            spans.sort(key=lambda span: span['start'])
+            stages = {}
+            for span in spans:
+                totals = stages.setdefault(span['stage'], {'count': 0, 'seconds': 0.0, 'bytes': 0})
+                totals['count'] += 1
+                totals['seconds'] = round(totals['seconds'] + span['self_seconds'], 6)
+                totals['bytes'] += span['bytes']
+            path = os.path.join(directory, re.sub(r"[^\w.-]+", "_", str(document)) + ".trace.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({'document': document, 'stages': stages, 'spans': spans}, f, indent=1)
+        return len(traces)
+
+    def serve(self, port=METRICS_PORT, host=""):
+        """Serve the metrics at http://host:port/metrics from a daemon thread; return the server."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _metric_name(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+# Shared by every module of the pipeline
+metrics = PipelineMetrics()
+
+
+def export_metrics(metrics_file=None, trace_dir=None):
+    """Print the stage summary and write the Prometheus file and per-document traces."""
+    print("Pipeline stages:")
+    metrics.summary()
+    if metrics_file:
+        metrics.write_prometheus(metrics_file)
+        print(f"Metrics saved to {metrics_file}")
+    if trace_dir:
+        print(f"{metrics.write_traces(trace_dir)} document trace(s) saved to {trace_dir}")
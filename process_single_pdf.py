@@ -1,27 +1,35 @@
-import boto3
 import json
 
+from rate_limiter import limited_client
+from s3_transfer import get_s3_client
+from textract_cache import TextractCache, cached_analyze_document, s3_content_id
+
 # Define the S3 bucket and file
 s3_bucket = "vascculogic"
 s3_key = "pdf/processed_20230408.pdf"
 
-# Initialize Textract client
-textract = boto3.client('textract')
+# Initialize clients and the local response cache
+s3 = get_s3_client()
+textract = limited_client('textract')
+textract_cache = TextractCache()
 
 # Function to process the PDF using Textract
 def process_pdf(bucket, key):
     try:
         print(f"Processing file: s3://{bucket}/{key}")
         
-        # Call Textract on the PDF
-        response = textract.analyze_document(
-            Document={
+        # Call Textract on the PDF, unless this exact object was analyzed before
+        response = cached_analyze_document(
+            textract,
+            textract_cache,
+            s3_content_id(s3, bucket, key),
+            ['TABLES', 'FORMS'],
+            {
                 'S3Object': {
                     'Bucket': bucket,
                     'Name': key
                 }
-            },
-            FeatureTypes=['TABLES', 'FORMS']
+            }
         )
         
         # Save the response to a JSON file
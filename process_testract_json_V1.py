@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 
-import json
 import csv
-import re
+
+from field_rules import FieldRule, compile_rules
+from form_fields import FORM_BLOCK_TYPES, FormBuilder, find_field
+from textract_stream import iter_blocks
 
 # CSV columns we want
 FIELDNAMES = [
@@ -17,9 +19,40 @@ FIELDNAMES = [
     "Clinical Discontinuation"
 ]
 
+# Form (KEY_VALUE_SET) pairs read with at least this confidence take
+# precedence over the line rules below
+FORM_MIN_CONFIDENCE = 50.0
+
+# Field rules, compiled once and evaluated in a single pass over the lines.
+# Each rule only looks at lines containing one of its keywords.
+FIELD_RULES = compile_rules([
+    # 'Boxed Warning' or 'Black Box Warning' => "Y"
+    # (We do NOT set it true for 'Warnings and Precautions')
+    FieldRule("Black Box Warning", ["boxed warning", "black box warning"], value="Y"),
+
+    # Naive brand/generic check: "keytruda" and "pembrolizumab" on the same line.
+    # Real logic might parse brand vs. generic more carefully.
+    FieldRule("Compound", ["keytruda"], requires=["pembrolizumab"], value="KEYTRUDA (pembrolizumab)"),
+
+    # "Initial U.S. Approval: 2014" => the piece after the colon
+    FieldRule("Approval", ["initial u.s. approval"], pattern=r"^[^:]*:([^:]*)"),
+
+    # The following fields are placeholders. Typically, you'd parse them by
+    # locating a "Section 14" or some other heading in your doc, then applying
+    # heuristics or regex to find data. Here, we just demonstrate possible examples.
+    FieldRule("Study", ["study number:"], pattern=r"study number:\s*(\S+)"),         # "Study Number: ABC123"
+    FieldRule("N for each study", ["="], pattern=r"\bn\s*=\s*(\d+)"),              # "N= 345"
+    FieldRule("Dose for each study", ["dose:"], pattern=r"dose:\s*(\S+\s*mg)"),     # "Dose: 50 mg"
+    FieldRule("Clinical Efficacy", ["clinical efficacy:"], pattern=r"clinical efficacy:\s*(.+)"),
+    FieldRule("Clinical Safety", ["clinical safety:"], pattern=r"clinical safety:\s*(.+)"),
+    FieldRule("Clinical Discontinuation", ["clinical discontinuation:"],
+              pattern=r"clinical discontinuation:\s*(.+)"),
+])
+
 def parse_textract(json_data):
     """
-    Parse the raw Textract JSON to find:
+    Parse the raw Textract JSON (a decoded dict, a path or an open stream)
+    to find:
       - Black Box Warning
       - Compound
       - Approval
@@ -45,112 +78,35 @@ def parse_textract(json_data):
         "Clinical Discontinuation": ""
     }
 
-    # We'll gather all recognized lines
-    all_lines = []
-    for block in json_data.get("Blocks", []):
-        if block.get("BlockType") == "LINE":
-            line_text = block.get("Text", "")
-            all_lines.append(line_text)
+    # One pass over the blocks, streamed from the JSON: lines go through the
+    # field rules, key/value blocks are collected for the form fields
+    forms = FormBuilder()
 
-    # --- EXAMPLE: Look for 'Boxed Warning' or 'Black Box Warning' ---
-    # If we see that phrase, we set "Black Box Warning" = "Y"
-    # (We do NOT set it true for 'Warnings and Precautions')
-    for line in all_lines:
-        lower_line = line.lower()
-        if "boxed warning" in lower_line or "black box warning" in lower_line:
-            parsed_data["Black Box Warning"] = "Y"
-            break  # Once found, no need to keep searching
-
-    # --- EXAMPLE: Look for brand/generic mention (KEYTRUDA) ---
-    # We'll just do a naive check for "keytruda" and "pembrolizumab" on the same line.
-    # Real logic might parse brand vs. generic more carefully.
-    for line in all_lines:
-        lower_line = line.lower()
-        if "keytruda" in lower_line and "pembrolizumab" in lower_line:
-            parsed_data["Compound"] = "KEYTRUDA (pembrolizumab)"
-            break
-
-    # --- EXAMPLE: Look for "Initial U.S. Approval: YYYY" ---
-    # We'll parse out the piece after the colon, if present.
-    # Commonly it's something like "Initial U.S. Approval: 2014"
-    for line in all_lines:
-        lower_line = line.lower()
-        if "initial u.s. approval" in lower_line:
-            parts = line.split(":")
-            if len(parts) > 1:
-                # e.g. "Initial U.S. Approval" is parts[0], then "2014" is parts[1]
-                parsed_data["Approval"] = parts[1].strip()
-            break
-
-    # ---------------------------------------------------------------------
-    # The following fields ("Study", "N for each study", "Dose for each study",
-    # "Clinical Efficacy", "Clinical Safety", "Clinical Discontinuation")
-    # are placeholders. Typically, you'd parse them by locating a "Section 14"
-    # or some other heading in your doc, then applying heuristics or regex to find data.
-    # Here, we just demonstrate possible examples.
-    # ---------------------------------------------------------------------
-
-    # Example: "Study"
-    # Suppose the doc might say "Study Number: ABC123"
-    for line in all_lines:
-        match = re.search(r"study number:\s*(\S+)", line, flags=re.IGNORECASE)
-        if match:
-            parsed_data["Study"] = match.group(1)
-            break
-
-    # Example: "N for each study"
-    # Suppose we might see "N= 345" in the doc
-    for line in all_lines:
-        match = re.search(r"\bn\s*=\s*(\d+)", line, flags=re.IGNORECASE)
-        if match:
-            parsed_data["N for each study"] = match.group(1)
-            break
-
-    # Example: "Dose for each study"
-    # Suppose we might see "Dose: 50 mg" somewhere
-    for line in all_lines:
-        match = re.search(r"dose:\s*(\S+\s*mg)", line, flags=re.IGNORECASE)
-        if match:
-            parsed_data["Dose for each study"] = match.group(1)
-            break
-
-    # Example: "Clinical Efficacy"
-    # Suppose there's a line "Clinical Efficacy: Superior to PBO by 20%"
-    for line in all_lines:
-        match = re.search(r"clinical efficacy:\s*(.+)", line, flags=re.IGNORECASE)
-        if match:
-            # We’ll store the entire substring after “Clinical Efficacy:”
-            parsed_data["Clinical Efficacy"] = match.group(1).strip()
-            break
-
-    # Example: "Clinical Safety"
-    for line in all_lines:
-        match = re.search(r"clinical safety:\s*(.+)", line, flags=re.IGNORECASE)
-        if match:
-            parsed_data["Clinical Safety"] = match.group(1).strip()
-            break
-
-    # Example: "Clinical Discontinuation"
-    for line in all_lines:
-        match = re.search(r"clinical discontinuation:\s*(.+)", line, flags=re.IGNORECASE)
-        if match:
-            parsed_data["Clinical Discontinuation"] = match.group(1).strip()
-            break
+    def lines():
+        for block in iter_blocks(json_data, block_types=('LINE',) + FORM_BLOCK_TYPES):
+            if block['BlockType'] == 'LINE':
+                yield block['Text']
+            else:
+                forms.add_block(block)
+
+    parsed_data.update(FIELD_RULES.extract(lines()))
+
+    # "Initial U.S. Approval" from the form key/value pairs when Textract
+    # detected it as one; the line rule's value is the fallback
+    approval = find_field(forms.fields(), "Initial U.S. Approval", FORM_MIN_CONFIDENCE)
+    if approval is not None and approval.value:
+        parsed_data["Approval"] = approval.value
 
     # Done extracting
     return parsed_data
 
 
 def main():
-    # 1) Load the Textract JSON from file
+    # 1) Parse the Textract JSON, streaming blocks from the file
     json_filename = "output_01072025.json"
-    with open(json_filename, "r", encoding="utf-8") as f:
-        textract_json = json.load(f)
-
-    # 2) Parse it to extract fields
-    row_data = parse_textract(textract_json)
+    row_data = parse_textract(json_filename)
 
-    # 3) Write a single-row CSV with our fields
+    # 2) Write a single-row CSV with our fields
     csv_output = "extracted_data_01072025.csv"
     with open(csv_output, mode="w", newline="", encoding="utf-8") as csvfile:
         writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
@@ -1,7 +1,18 @@
 import boto3
 import json
-import time
-import os
+
+from pdf_manifest import list_changed_pdfs, record_processed
+from pdf_preflight import remap_block_pages, upload_targeted_pdf
+from pipeline_metrics import export_metrics, metrics
+from profiling import profile_from_command_line, profiled, write_profile
+from rate_limiter import limited_client
+from s3_transfer import get_object_bytes, get_s3_client
+from section_index import SectionIndex
+from table_engine import TABLE_BLOCK_TYPES, TableBuilder, study_rows
+from textract_jobs import FINISHED_STATUSES, JobPoller, run_textract_jobs
+from textract_notifications import QueueTracker, SqsQueue, notification_channel
+from textract_output import download_job_output
+from textract_stream import iter_analysis_blocks, iter_blocks
 
 # AWS S3 and Textract setup
 s3_bucket = "vascculogic"  # Bucket name only (no "/")
@@ -9,55 +20,95 @@ prefix = "pdf/"  # Prefix for the folder containing PDFs
 analysis_output_bucket = "vascculogic"  # Bucket for Textract output
 output_prefix = "textract_analysis/output/"
 region = "us-east-1"  # Replace with your region
+max_in_flight = 10  # Concurrent Textract jobs; keep below the account quota
+manifest_file = "process_textract.manifest.json"  # PDFs (key/ETag/size) already processed
+metrics_file = "process_textract.prom"  # per-stage metrics, Prometheus textfile format
+trace_dir = "process_textract.traces"  # one JSON trace of the stages per PDF
+metrics_port = None  # e.g. 9464 to serve /metrics while the batch runs
+
+# Job completion: "poll" calls get_document_analysis, "sns" waits for the
+# TextractTopic notification delivered to an SQS queue subscribed to it
+completion_mode = "poll"
+sns_topic_arn = "arn:aws:sns:us-east-1:001752764000:TextractTopic"
+sns_role_arn = "arn:aws:iam::001752764000:role/TextractSNSPublishRole"  # Replace with your role
+completion_queue_url = "https://sqs.us-east-1.amazonaws.com/001752764000/TextractCompletions"  # Replace with your queue
+
+# Job results: "s3" writes shards under output_prefix and downloads them,
+# "api" pages through get_document_analysis straight into the parser
+result_mode = "s3"
+
+# Submit only page 1 and the Section 14 pages, found from the PDF's own text
+# layer (see pdf_preflight); the reduced PDF is uploaded under targeted_prefix.
+# Off by default: it downloads every PDF and needs s3:PutObject on the
+# bucket (granted in textract-policy.json) in addition to read access.
+targeted_pages = False
+targeted_prefix = "textract_analysis/targeted/"
 
 # Initialize clients
-s3_client = boto3.client('s3', region_name=region)
-textract_client = boto3.client('textract', region_name=region)
+s3_client = get_s3_client(region)
+textract_client = limited_client('textract', region)  # shares the host-wide TPS budget
 
 def list_pdfs(bucket_name, prefix=""):
-    """List all PDFs in the given S3 bucket with a specific prefix."""
-    response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix=prefix)
-    if 'Contents' not in response:
+    """
+    List the PDFs under the prefix (paginated, sub-prefixes in parallel) and
+    return (new_or_changed_keys, listing). Keys already in the manifest with
+    the same ETag and size are skipped.
+    """
+    pdf_files, listing = list_changed_pdfs(s3_client, bucket_name, prefix, manifest_file)
+    if not listing:
         print(f"No files found in {bucket_name}/{prefix}")
-        return []
-    pdf_files = [obj['Key'] for obj in response['Contents'] if obj['Key'].endswith('.pdf')]
-    return pdf_files
+    return pdf_files, listing
 
 def start_textract_job(bucket, file_name):
     """Start a Textract job for a given file."""
-    response = textract_client.start_document_analysis(
-        DocumentLocation={'S3Object': {'Bucket': bucket, 'Name': file_name}},
-        FeatureTypes=["TABLES", "FORMS"],
-        OutputConfig={'S3Bucket': analysis_output_bucket, 'S3Prefix': output_prefix}
-    )
+    job_args = {
+        'DocumentLocation': {'S3Object': {'Bucket': bucket, 'Name': file_name}},
+        'FeatureTypes': ["TABLES", "FORMS"]
+    }
+    if result_mode == "s3":
+        job_args['OutputConfig'] = {'S3Bucket': analysis_output_bucket, 'S3Prefix': output_prefix}
+    if completion_mode == "sns":
+        job_args['NotificationChannel'] = notification_channel(sns_topic_arn, sns_role_arn)
+    response = textract_client.start_document_analysis(**job_args)
     return response['JobId']
 
+# Original page numbers of the pages submitted for each PDF (targeted_pages)
+page_maps = {}
+
+def submit_pdf(pdf_file):
+    """Start the Textract job for a PDF, reduced to the pages that matter if targeted_pages is on."""
+    key = pdf_file
+    if targeted_pages:
+        try:
+            pdf_bytes = get_object_bytes(s3_client, s3_bucket, pdf_file)
+            key, page_maps[pdf_file] = upload_targeted_pdf(s3_client, pdf_bytes, s3_bucket, pdf_file, targeted_prefix)
+        except Exception as e:
+            print(f"Preflight failed for {pdf_file}, submitting all pages: {e}")
+            key = pdf_file
+    return start_textract_job(s3_bucket, key)
+
 def check_job_status(job_id):
-    """Check the status of a Textract job."""
-    while True:
-        response = textract_client.get_document_analysis(JobId=job_id)
-        status = response['JobStatus']
-        if status in ['SUCCEEDED', 'FAILED']:
-            return status
+    """
+    Poll the status of a Textract job once (no waiting).
+    MaxResults=1 keeps the response small while the job is still running.
+    """
+    response = textract_client.get_document_analysis(JobId=job_id, MaxResults=1)
+    status = response['JobStatus']
+    if status not in FINISHED_STATUSES:
         print(f"Job {job_id} is {status}. Waiting...")
-        time.sleep(5)
-
-def download_textract_output(bucket, prefix, local_dir="./output"):
-    """Download Textract output from S3."""
-    os.makedirs(local_dir, exist_ok=True)
-    response = s3_client.list_objects_v2(Bucket=bucket, Prefix=prefix)
-    if 'Contents' not in response:
-        print(f"No output files found in {bucket}/{prefix}")
-        return
-    for obj in response['Contents']:
-        file_name = obj['Key'].split('/')[-1]
-        s3_client.download_file(bucket, obj['Key'], f"{local_dir}/{file_name}")
-
-def parse_textract_output(file_path):
-    """Parse the Textract output for the required fields."""
-    with open(file_path, 'r') as f:
-        textract_data = json.load(f)
-    
+    return status
+
+def download_textract_output(bucket, prefix, job_id, local_dir="./output"):
+    """Download the output shards of one Textract job into ./output/<JobId>/."""
+    return download_job_output(s3_client, bucket, prefix, job_id, local_dir)
+
+@profiled('parse_textract_output')
+def parse_textract_output(source):
+    """
+    Parse the Textract output of one job for the required fields.
+    `source` is the job's shard directory (streamed in page order as one
+    document), a single JSON file, or blocks from iter_analysis_blocks.
+    """
     extracted_data = {
         "Black Box Warning": "",
         "Compound": "",
@@ -65,42 +116,82 @@ def parse_textract_output(file_path):
         "Studies": []
     }
     
-    for block in textract_data.get('Blocks', []):
+    # One pass: lines feed the field checks and the section index, table
+    # blocks are collected and resolved into grids afterwards
+    section_index = SectionIndex()
+    tables = TableBuilder()
+    for block in iter_blocks(source, block_types=('LINE',) + TABLE_BLOCK_TYPES):
         if block['BlockType'] == 'LINE':
             text = block['Text']
+            section_index.add_line(block.get('Page', 1), text)
             if "BLACK BOX WARNING" in text.upper():
                 extracted_data["Black Box Warning"] = text
             elif "COMPOUND" in text.upper():
                 extracted_data["Compound"] = text
             elif "APPROVAL" in text.upper():
                 extracted_data["Approval"] = text
-        elif block['BlockType'] == 'TABLE':
-            # Parse table data for Studies, N, Dose, etc.
-            pass  # Implement table parsing logic here
+        else:
+            tables.add_block(block)
+    section_index.finish()
+
+    # Studies, N and dose come from the arm columns of the Section 14 tables
+    extracted_data["Studies"] = study_rows(section_tables(tables, section_index))
     
     return extracted_data
 
+def section_tables(tables, section_index):
+    """Return the tables on the Section 14 pages (all tables if it was not found)."""
+    span = section_index.get(14)
+    return [table for table in tables.tables()
+            if span is None or span.start_page <= table.page <= span.end_page]
+
+def make_job_tracker():
+    """Return the completion tracker for the configured completion_mode."""
+    if completion_mode == "sns":
+        sqs_client = boto3.client('sqs', region_name=region)
+        return QueueTracker(SqsQueue(sqs_client, completion_queue_url), get_status=check_job_status)
+    return JobPoller(check_job_status)
+
+def handle_finished_job(pdf_file, job_id, status):
+    """Download and parse one finished job while the others keep running."""
+    if status != 'SUCCEEDED':
+        print(f"Textract job {job_id} failed.")
+        return None
+    if result_mode == "api":
+        print(f"Textract job {job_id} succeeded. Streaming results...")
+        source = iter_analysis_blocks(textract_client, job_id)
+    else:
+        print(f"Textract job {job_id} succeeded. Downloading output...")
+        source = download_textract_output(analysis_output_bucket, output_prefix, job_id)
+
+    # Map the pages of a reduced PDF back to the original numbering
+    if page_maps.get(pdf_file):
+        source = remap_block_pages(iter_blocks(source), page_maps[pdf_file])
+
+    # Parse this job's output once, as a single document
+    with metrics.stage('field_extraction'):
+        parsed_data = parse_textract_output(source)
+    print(f"Results for {pdf_file}:")
+    print(json.dumps(parsed_data, indent=2))
+    return parsed_data
+
 # Main script
 if __name__ == "__main__":
-    pdf_files = list_pdfs(s3_bucket, prefix)
-    print(f"Found {len(pdf_files)} PDF files to process.")
-
-    for pdf_file in pdf_files:
-        print(f"Processing file: {pdf_file}")
-        job_id = start_textract_job(s3_bucket, pdf_file)
-        print(f"Started Textract job with ID: {job_id}")
-
-        status = check_job_status(job_id)
-        if status == 'SUCCEEDED':
-            print(f"Textract job {job_id} succeeded. Downloading output...")
-            download_textract_output(analysis_output_bucket, output_prefix)
-        else:
-            print(f"Textract job {job_id} failed.")
+    profile_from_command_line()  # --profile[=stage,...]: CPU and memory reports next to the output
+    if metrics_port:
+        metrics.serve(metrics_port)
+    pdf_files, pdf_listing = list_pdfs(s3_bucket, prefix)
+    print(f"Found {len(pdf_files)} new or changed PDF files to process ({len(pdf_listing)} in total).")
 
-    print("Parsing Textract output...")
-    output_files = [f"./output/{file}" for file in os.listdir("./output") if file.endswith(".json")]
-    for output_file in output_files:
-        parsed_data = parse_textract_output(output_file)
-        print(f"Results for {output_file}:")
-        print(json.dumps(parsed_data, indent=2))
+    parsed_by_pdf = run_textract_jobs(
+        pdf_files,
+        start_job=submit_pdf,
+        tracker=make_job_tracker(),
+        on_complete=handle_finished_job,
+        max_in_flight=max_in_flight
+    )
 
+    # Only successfully parsed PDFs are skipped next time
+    record_processed(manifest_file, pdf_listing, [f for f in pdf_files if parsed_by_pdf.get(f)])
+    export_metrics(metrics_file, trace_dir)
+    write_profile(metrics_file)
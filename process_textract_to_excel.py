@@ -1,8 +1,20 @@
 import boto3
-import json
-import os
-import time
-import pandas as pd
+import functools
+
+from pdf_manifest import list_changed_pdfs, record_processed, stored_rows
+from pdf_preflight import remap_block_pages, upload_targeted_pdf
+from pipeline_metrics import export_metrics, metrics
+from profiling import profile_from_command_line, profiled, write_profile
+from report_writers import open_report_writer
+from run_journal import RunJournal
+from rate_limiter import limited_client
+from s3_transfer import get_object_bytes, get_s3_client
+from section_index import SectionIndex
+from table_engine import TABLE_BLOCK_TYPES, TableBuilder, study_rows, summarize_studies
+from textract_jobs import FINISHED_STATUSES, JobPoller, run_textract_jobs
+from textract_notifications import QueueTracker, SqsQueue, notification_channel
+from textract_output import download_job_output
+from textract_stream import iter_analysis_blocks, iter_blocks
 
 # AWS S3 and Textract setup
 s3_bucket = "vascculogic"  # Bucket name only
@@ -10,55 +22,119 @@ prefix = "pdf/"  # Prefix for the folder containing PDFs
 analysis_output_bucket = "vascculogic"  # Bucket for Textract output
 output_prefix = "textract_analysis/output/"
 region = "us-east-1"  # Replace with your region
+max_in_flight = 10  # Concurrent Textract jobs; keep below the account quota
+manifest_file = "textract_results.manifest.json"  # PDFs (key/ETag/size) already processed, with their rows
+excel_output = "textract_results.xlsx"  # .xlsx, .csv or .parquet
+journal_file = "textract_results.journal.jsonl"  # per-PDF progress, lets an interrupted run resume
+metrics_file = "textract_results.prom"  # per-stage metrics, Prometheus textfile format
+trace_dir = "textract_results.traces"  # one JSON trace of the stages per PDF
+metrics_port = None  # e.g. 9464 to serve /metrics while the batch runs
+
+# Job completion: "poll" calls get_document_analysis, "sns" waits for the
+# TextractTopic notification delivered to an SQS queue subscribed to it
+completion_mode = "poll"
+sns_topic_arn = "arn:aws:sns:us-east-1:001752764000:TextractTopic"
+sns_role_arn = "arn:aws:iam::001752764000:role/TextractSNSPublishRole"  # Replace with your role
+completion_queue_url = "https://sqs.us-east-1.amazonaws.com/001752764000/TextractCompletions"  # Replace with your queue
+
+# Job results: "s3" writes shards under output_prefix and downloads them,
+# "api" pages through get_document_analysis straight into the parser
+result_mode = "s3"
+
+# Submit only page 1 and the Section 14 pages, found from the PDF's own text
+# layer (see pdf_preflight); the reduced PDF is uploaded under targeted_prefix.
+# Off by default: it downloads every PDF and needs s3:PutObject on the
+# bucket (granted in textract-policy.json) in addition to read access.
+targeted_pages = False
+targeted_prefix = "textract_analysis/targeted/"
 
 # Initialize clients
-s3_client = boto3.client('s3', region_name=region)
-textract_client = boto3.client('textract', region_name=region)
+s3_client = get_s3_client(region)
+textract_client = limited_client('textract', region)  # shares the host-wide TPS budget
 
 def list_pdfs(bucket_name, prefix=""):
-    """List all PDFs in the given S3 bucket with a specific prefix."""
-    response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix=prefix)
-    if 'Contents' not in response:
+    """
+    List the PDFs under the prefix (paginated, sub-prefixes in parallel) and
+    return (new_or_changed_keys, listing). Keys already in the manifest with
+    the same ETag and size are skipped; their rows come from the manifest.
+    """
+    pdf_files, listing = list_changed_pdfs(s3_client, bucket_name, prefix, manifest_file, with_rows=True)
+    if not listing:
         print(f"No files found in {bucket_name}/{prefix}")
-        return []
-    pdf_files = [obj['Key'] for obj in response['Contents'] if obj['Key'].endswith('.pdf')]
-    return pdf_files
+    return pdf_files, listing
 
 def start_textract_job(bucket, file_name):
     """Start a Textract job for a given file."""
-    response = textract_client.start_document_analysis(
-        DocumentLocation={'S3Object': {'Bucket': bucket, 'Name': file_name}},
-        FeatureTypes=["TABLES", "FORMS"],
-        OutputConfig={'S3Bucket': analysis_output_bucket, 'S3Prefix': output_prefix}
-    )
+    job_args = {
+        'DocumentLocation': {'S3Object': {'Bucket': bucket, 'Name': file_name}},
+        'FeatureTypes': ["TABLES", "FORMS"]
+    }
+    if result_mode == "s3":
+        job_args['OutputConfig'] = {'S3Bucket': analysis_output_bucket, 'S3Prefix': output_prefix}
+    if completion_mode == "sns":
+        job_args['NotificationChannel'] = notification_channel(sns_topic_arn, sns_role_arn)
+    response = textract_client.start_document_analysis(**job_args)
     return response['JobId']
 
+# Original page numbers of the pages submitted for each PDF (targeted_pages)
+page_maps = {}
+
+def submit_pdf(pdf_file):
+    """Start the Textract job for a PDF, reduced to the pages that matter if targeted_pages is on."""
+    key = pdf_file
+    if targeted_pages:
+        try:
+            pdf_bytes = get_object_bytes(s3_client, s3_bucket, pdf_file)
+            key, page_maps[pdf_file] = upload_targeted_pdf(s3_client, pdf_bytes, s3_bucket, pdf_file, targeted_prefix)
+        except Exception as e:
+            print(f"Preflight failed for {pdf_file}, submitting all pages: {e}")
+            key = pdf_file
+    return start_textract_job(s3_bucket, key)
+
+def start_or_resume(pdf_file, pdf_listing, journal):
+    """
+    Return the JobId of the job an interrupted run already started for this
+    version of the PDF if Textract still knows it, otherwise submit the PDF.
+    `pdf_listing` is the listing from list_pdfs and `journal` the run's
+    RunJournal; bind them with functools.partial for run_textract_jobs.
+    """
+    version = pdf_listing[pdf_file]['ETag']
+    entry = journal.entry(pdf_file, version)
+    if entry.get('job_id'):
+        try:
+            check_job_status(entry['job_id'])
+            print(f"Resuming Textract job {entry['job_id']} for {pdf_file}")
+            if entry.get('page_map'):
+                page_maps[pdf_file] = entry['page_map']
+            return entry['job_id']
+        except Exception as e:
+            print(f"Cannot resume job {entry['job_id']} for {pdf_file}, resubmitting: {e}")
+    job_id = submit_pdf(pdf_file)
+    journal.record(pdf_file, 'submitted', version, job_id=job_id, page_map=page_maps.get(pdf_file))
+    return job_id
+
 def check_job_status(job_id):
-    """Check the status of a Textract job."""
-    while True:
-        response = textract_client.get_document_analysis(JobId=job_id)
-        status = response['JobStatus']
-        if status in ['SUCCEEDED', 'FAILED']:
-            return status
+    """
+    Poll the status of a Textract job once (no waiting).
+    MaxResults=1 keeps the response small while the job is still running.
+    """
+    response = textract_client.get_document_analysis(JobId=job_id, MaxResults=1)
+    status = response['JobStatus']
+    if status not in FINISHED_STATUSES:
         print(f"Job {job_id} is {status}. Waiting...")
-        time.sleep(5)
-
-def download_textract_output(bucket, prefix, local_dir="./output"):
-    """Download Textract output from S3."""
-    os.makedirs(local_dir, exist_ok=True)
-    response = s3_client.list_objects_v2(Bucket=bucket, Prefix=prefix)
-    if 'Contents' not in response:
-        print(f"No output files found in {bucket}/{prefix}")
-        return
-    for obj in response['Contents']:
-        file_name = obj['Key'].split('/')[-1]
-        s3_client.download_file(bucket, obj['Key'], f"{local_dir}/{file_name}")
-
-def parse_textract_output(file_path):
-    """Parse the Textract output for the required fields."""
-    with open(file_path, 'r') as f:
-        textract_data = json.load(f)
-    
+    return status
+
+def download_textract_output(bucket, prefix, job_id, local_dir="./output"):
+    """Download the output shards of one Textract job into ./output/<JobId>/."""
+    return download_job_output(s3_client, bucket, prefix, job_id, local_dir)
+
+@profiled('parse_textract_output')
+def parse_textract_output(source):
+    """
+    Parse the Textract output of one job for the required fields.
+    `source` is the job's shard directory (streamed in page order as one
+    document), a single JSON file, or blocks from iter_analysis_blocks.
+    """
     parsed_data = {
         "Black Box Warning": False,
         "Compound Name": "",
@@ -71,54 +147,120 @@ def parse_textract_output(file_path):
         "Clinical Discontinuation": ""
     }
     
-    for block in textract_data.get('Blocks', []):
+    # One pass: lines feed the field checks and the section index, table
+    # blocks are collected and resolved into grids afterwards
+    section_index = SectionIndex()
+    tables = TableBuilder()
+    for block in iter_blocks(source, block_types=('LINE',) + TABLE_BLOCK_TYPES):
         if block['BlockType'] == 'LINE':
             text = block['Text']
+            section_index.add_line(block.get('Page', 1), text)
             if "BLACK BOX WARNING" in text.upper():
                 parsed_data["Black Box Warning"] = True
             elif "COMPOUND" in text.upper():
                 parsed_data["Compound Name"] = text
             elif "APPROVAL" in text.upper():
                 parsed_data["Approval"] = text
-        elif block['BlockType'] == 'TABLE':
-            # Handle table data for specific fields like Study Numbers, Doses, etc.
-            pass  # Implement detailed parsing here
+        else:
+            tables.add_block(block)
+    section_index.finish()
+
+    # Study numbers, N and doses come from the arm columns of the Section 14 tables
+    (parsed_data["Study Numbers"],
+     parsed_data["Sample Sizes (N)"],
+     parsed_data["Doses"]) = summarize_studies(study_rows(section_tables(tables, section_index)))
     
     return parsed_data
 
-# Main script
-if __name__ == "__main__":
-    pdf_files = list_pdfs(s3_bucket, prefix)
-    print(f"Found {len(pdf_files)} PDF files to process.")
+def section_tables(tables, section_index):
+    """Return the tables on the Section 14 pages (all tables if it was not found)."""
+    span = section_index.get(14)
+    return [table for table in tables.tables()
+            if span is None or span.start_page <= table.page <= span.end_page]
 
-    # DataFrame to store results
-    results = []
+def make_job_tracker():
+    """Return the completion tracker for the configured completion_mode."""
+    if completion_mode == "sns":
+        sqs_client = boto3.client('sqs', region_name=region)
+        return QueueTracker(SqsQueue(sqs_client, completion_queue_url), get_status=check_job_status)
+    return JobPoller(check_job_status)
 
-    for pdf_file in pdf_files:
-        print(f"Processing file: {pdf_file}")
-        job_id = start_textract_job(s3_bucket, pdf_file)
-        print(f"Started Textract job with ID: {job_id}")
+def handle_finished_job(pdf_file, job_id, status, pdf_listing, journal, report):
+    """
+    Download and parse one finished job while the others keep running, and
+    append its row to `report` (see start_or_resume for the other arguments).
+    """
+    version = pdf_listing[pdf_file]['ETag']
+    if status != 'SUCCEEDED':
+        print(f"Textract job {job_id} failed.")
+        journal.reset(pdf_file)  # submit again next run
+        return None
+    if result_mode == "api":
+        print(f"Textract job {job_id} succeeded. Streaming results...")
+        source = iter_analysis_blocks(textract_client, job_id)
+    else:
+        print(f"Textract job {job_id} succeeded. Downloading output...")
+        source = download_textract_output(analysis_output_bucket, output_prefix, job_id)
+        journal.record(pdf_file, 'downloaded', version, job_dir=source)
 
-        status = check_job_status(job_id)
-        if status == 'SUCCEEDED':
-            print(f"Textract job {job_id} succeeded. Downloading output...")
-            download_textract_output(analysis_output_bucket, output_prefix)
-        else:
-            print(f"Textract job {job_id} failed.")
-            continue
+    # Map the pages of a reduced PDF back to the original numbering
+    if page_maps.get(pdf_file):
+        source = remap_block_pages(iter_blocks(source), page_maps[pdf_file])
+
+    # Parse this job's output once, as a single document
+    with metrics.stage('field_extraction'):
+        parsed_data = parse_textract_output(source)
+    parsed_data["PDF File"] = pdf_file  # Add the PDF file name for reference
 
-        # Parse output and add to results
-        output_files = [f"./output/{file}" for file in os.listdir("./output") if file.endswith(".json")]
-        for output_file in output_files:
-            parsed_data = parse_textract_output(output_file)
-            parsed_data["PDF File"] = pdf_file  # Add the PDF file name for reference
-            results.append(parsed_data)
+    # Append to the report now rather than holding every row until the end
+    report.write_row(parsed_data)
+    report.flush()
+    journal.record(pdf_file, 'extracted', version, row=parsed_data)
+    return parsed_data
+
+# Main script
+if __name__ == "__main__":
+    profile_from_command_line()  # --profile[=stage,...]: CPU and memory reports next to the output
+    if metrics_port:
+        metrics.serve(metrics_port)
+    pdf_files, pdf_listing = list_pdfs(s3_bucket, prefix)
+    print(f"Found {len(pdf_files)} new or changed PDF files to process ({len(pdf_listing)} in total).")
+
+    # PDFs an interrupted run already extracted keep their journaled rows
+    journal = RunJournal(journal_file)
+    versions = {f: pdf_listing[f]['ETag'] for f in pdf_files}
+    report = open_report_writer(excel_output)
 
-    # Create a DataFrame from the results
-    df = pd.DataFrame(results)
+    # The report is rewritten in full: unchanged PDFs keep the rows stored
+    # in the manifest by the run that processed them
+    unchanged = sorted(set(pdf_listing) - set(pdf_files))
+    report.write_rows(stored_rows(manifest_file, unchanged))
+    resumed = {f: journal.entry(f, versions[f])['row'] for f in pdf_files if journal.done(f, versions[f])}
+    if resumed:
+        print(f"Resuming: {len(resumed)} PDF(s) already extracted.")
+        report.write_rows(resumed.values())
+        report.flush()
 
-    # Save to Excel
-    excel_output = "textract_results.xlsx"
-    df.to_excel(excel_output, index=False)
-    print(f"Results saved to {excel_output}")
+    # Keep up to max_in_flight jobs running; each finished job is parsed and
+    # written to the report as it completes
+    parsed_by_pdf = run_textract_jobs(
+        [f for f in pdf_files if f not in resumed],
+        start_job=functools.partial(start_or_resume, pdf_listing=pdf_listing, journal=journal),
+        tracker=make_job_tracker(),
+        on_complete=functools.partial(handle_finished_job, pdf_listing=pdf_listing, journal=journal,
+                                      report=report),
+        max_in_flight=max_in_flight
+    )
+    parsed_by_pdf.update(resumed)
+    report.close()
+    # Once every PDF is in the manifest the journal has nothing left to resume
+    if all(parsed_by_pdf.get(f) for f in pdf_files):
+        journal.discard()
+    else:
+        journal.close()
+    print(f"Results saved to {excel_output} ({report.rows_written} PDFs)")
 
+    # Only successfully parsed PDFs are skipped next time
+    record_processed(manifest_file, pdf_listing, [f for f in pdf_files if parsed_by_pdf.get(f)], parsed_by_pdf)
+    export_metrics(metrics_file, trace_dir)
+    write_profile(excel_output)
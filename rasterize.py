@@ -1,23 +1,74 @@
+from concurrent.futures import ProcessPoolExecutor
+import io
+
 from pdf2image import convert_from_path
 import img2pdf
-import os
+import pikepdf
+
+from pdf_preflight import has_text_layer, page_texts
 
 original_pdf = "20230408_flattened.pdf"
-output_images = convert_from_path(original_pdf, dpi=300)  # each page as a PIL image
+rasterized_pdf = "20230408_rasterized.pdf"
+dpi = 300
+workers = 4                 # rendering processes
+max_pages_in_flight = 4     # pages being rendered or waiting for the pages before them
+skip_text_pages = True      # keep pages that already have a usable text layer as they are
 
-# Save each page as a PNG
-image_files = []
-for i, page_image in enumerate(output_images):
-    page_filename = f"page_{i}.png"
-    page_image.save(page_filename, "PNG")
-    image_files.append(page_filename)
 
-# Combine images back into a single PDF
-rasterized_pdf = "20230408_rasterized.pdf"
-with open(rasterized_pdf, "wb") as f:
-    f.write(img2pdf.convert(image_files))
+def render_page(pdf_path, page_number, dpi):
+    """
+    Render one page in a worker process and return it as a one-page PDF,
+    so the decoded image never leaves the worker.
+    """
+    page_image = convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number)[0]
+    buffer = io.BytesIO()
+    page_image.save(buffer, "PNG", dpi=(dpi, dpi))
+    page_image.close()
+    return img2pdf.convert(buffer.getvalue())
+
+
+def rasterize_pdf(source_pdf, output_pdf):
+    """
+    Rasterize `source_pdf` into `output_pdf` without temp files.
+
+    At most max_pages_in_flight pages are rendered ahead of the writer, and
+    finished pages are appended to the output in page order. This bounds
+    the rendering work, not the memory: pikepdf writes the output in one
+    go on save, so every rendered page is kept until then, as a compressed
+    one-page PDF rather than a decoded image.
+    """
+    texts = page_texts(source_pdf)
+    to_render = [
+        page_number for page_number, text in enumerate(texts, start=1)
+        if not (skip_text_pages and has_text_layer(text))
+    ]
+    print(f"Rasterizing {len(to_render)} of {len(texts)} pages")
+
+    original = pikepdf.Pdf.open(source_pdf)
+    output = pikepdf.Pdf.new()
+    rendered = []  # one-page PDFs appended so far; pikepdf reads them again on save, so keep them open
+    pending = iter(to_render)
+    in_flight = {}  # page number -> future, the lowest pages not yet written
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, max_pages_in_flight))) as pool:
+        def submit_more():
+            while len(in_flight) < max(1, max_pages_in_flight):
+                page_number = next(pending, None)
+                if page_number is None:
+                    return
+                in_flight[page_number] = pool.submit(render_page, source_pdf, page_number, dpi)
+
+        submit_more()
+        for page_number in range(1, len(texts) + 1):
+            if page_number not in in_flight:
+                output.pages.append(original.pages[page_number - 1])
+                continue
+            # Pages are submitted in order, so the next one to write is in flight
+            page_pdf = pikepdf.Pdf.open(io.BytesIO(in_flight.pop(page_number).result()))
+            output.pages.append(page_pdf.pages[0])
+            rendered.append(page_pdf)
+            submit_more()
+    output.save(output_pdf)
 
-# Clean up image files if you want
-for img in image_files:
-    os.remove(img)
 
+if __name__ == "__main__":
+    rasterize_pdf(original_pdf, rasterized_pdf)
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+
+import contextlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: the limits are then shared between threads only
+    fcntl = None
+
+# ---------------
+# CONFIGURATION
+# ---------------
+# Calls per second allowed by the default account quotas (per region).
+# Raise them here after a quota increase; AIMD only ever goes below them.
+RATES = {
+    'analyze_document': 10,
+    'start_document_analysis': 10,
+    'get_document_analysis': 10,
+    'get_object': 5500,
+    'head_object': 5500,
+    'put_object': 3500,
+    'list_objects_v2': 5500,
+}
+BURST = 1                       # tokens a bucket can save up; 1 spaces calls evenly
+MIN_RATE_FRACTION = 0.05        # AIMD never goes below this share of the quota
+DECREASE_FACTOR = 0.5           # multiplicative decrease on a throttling error
+ADDITIVE_INCREASE = 0.5         # calls/s regained per second of unthrottled calls
+MAX_ATTEMPTS = 8
+BASE_BACKOFF = 0.5              # seconds; full jitter, doubled per attempt
+MAX_BACKOFF = 20.0
+STATE_FILE = os.path.join(tempfile.gettempdir(), "textract_rate_limits.json")
+
+# botocore's own retries on limited clients. RateLimiter.call retries and
+# paces throttling errors; adaptive mode or many attempts underneath it
+# would hide throttles from AIMD and multiply the attempts per call.
+CLIENT_RETRIES = {'max_attempts': 3, 'mode': 'standard'}
+
+THROTTLE_CODES = ('ThrottlingException', 'ProvisionedThroughputExceededException',
+                  'LimitExceededException', 'TooManyRequestsException', 'RequestLimitExceeded',
+                  'SlowDown', 'Throttling')
+
+_shared = {}
+
+
+# ---------------
+# LIMITER
+# ---------------
+
+def error_code(error):
+    """The AWS error code of a botocore ClientError (or look-alike), else None."""
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        return response.get('Error', {}).get('Code')
+    return None
+
+
+class RateLimiter:
+    """
+    Token bucket per API operation with AIMD rate adjustment:
+
+      - acquire(operation) waits for a token; tokens refill at the
+        operation's current rate, starting at its quota (RATES);
+      - a throttling error halves the rate, each successful call adds a
+        little back, so the rate settles just under the real ceiling;
+      - call() wraps both around an API call and retries throttling errors
+        with full-jitter exponential back-off.
+
+    With a `state_file` the buckets live in that JSON file, locked with
+    fcntl for every update, so every thread and process on the host that
+    uses the same file shares one budget per operation. Without one (or
+    without fcntl) they are shared between the threads of this process.
+    `sleep` and `clock` can be replaced, e.g. by a simulated clock.
+    """
+
+    def __init__(self, rates=None, state_file=None, sleep=time.sleep, clock=time.time,
+                 max_attempts=MAX_ATTEMPTS):
+        self.rates = dict(RATES if rates is None else rates)
+        self.state_file = state_file if fcntl is not None else None
+        self.sleep = sleep
+        self.clock = clock
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.buckets = {}
+
+    def limits(self, operation):
+        return operation.rsplit('/', 1)[-1] in self.rates
+
+    @contextlib.contextmanager
+    def _state(self):
+        """The buckets, locked for this thread (and process, with a state file)."""
+        with self.lock:
+            if self.state_file is None:
+                yield self.buckets
+                return
+            with open(self.state_file, 'a+', encoding='utf-8') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                f.seek(0)
+                try:
+                    buckets = json.loads(f.read() or '{}')
+                except ValueError:
+                    buckets = {}  # written by an older layout; start afresh
+                yield buckets
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(buckets))
+                f.flush()
+
+    def _bucket(self, buckets, operation, now):
+        quota = self.rates[operation.rsplit('/', 1)[-1]]
+        bucket = buckets.get(operation)
+        if bucket is None:
+            bucket = buckets[operation] = {'rate': quota, 'tokens': BURST, 'updated': now}
+        # Refill for the time since the last update
+        elapsed = max(now - bucket['updated'], 0.0)
+        bucket['tokens'] = min(BURST, bucket['tokens'] + elapsed * bucket['rate'])
+        bucket['updated'] = now
+        return bucket, quota
+
+    def acquire(self, operation):
+        """Wait until `operation` may be called."""
+        while True:
+            with self._state() as buckets:
+                bucket, _ = self._bucket(buckets, operation, self.clock())
+                # A refill can land a rounding error short of a whole token
+                if bucket['tokens'] >= 1 - 1e-9:
+                    bucket['tokens'] -= 1
+                    return
+                wait = (1 - bucket['tokens']) / bucket['rate']
+            self.sleep(wait)
+
+    def throttled(self, operation):
+        """Multiplicative decrease after a throttling error."""
+        with self._state() as buckets:
+            bucket, quota = self._bucket(buckets, operation, self.clock())
+            bucket['rate'] = max(quota * MIN_RATE_FRACTION, bucket['rate'] * DECREASE_FACTOR)
+            bucket['tokens'] = min(bucket['tokens'], 0)
+
+    def succeeded(self, operation):
+        """Additive increase after a successful call."""
+        with self._state() as buckets:
+            bucket, quota = self._bucket(buckets, operation, self.clock())
+            bucket['rate'] = min(quota, bucket['rate'] + ADDITIVE_INCREASE / bucket['rate'])
+
+    def rate(self, operation):
+        """The current calls/s allowed for `operation`."""
+        with self._state() as buckets:
+            return self._bucket(buckets, operation, self.clock())[0]['rate']
+
+    def call(self, operation, function, *args, **kwargs):
+        """Call `function` under the operation's limit, retrying throttling errors."""
+        for attempt in range(1, self.max_attempts + 1):
+            self.acquire(operation)
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                if error_code(e) not in THROTTLE_CODES or attempt == self.max_attempts:
+                    raise
+                self.throttled(operation)
+                self.sleep(random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * 2 ** attempt)))
+                continue
+            self.succeeded(operation)
+            return result
+
+
+class LimitedClient:
+    """
+    Proxy for a boto3 client: the operations in the limiter's RATES go
+    through RateLimiter.call, everything else (paginators, managed
+    transfers, meta, ...) is passed straight through. Buckets are kept per
+    region, since quotas are.
+    """
+
+    def __init__(self, client, limiter):
+        self.client = client
+        self.limiter = limiter
+        meta = getattr(client, 'meta', None)
+        self.region = getattr(meta, 'region_name', None) or 'default'
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+        if not callable(attribute) or not self.limiter.limits(name):
+            return attribute
+        operation = f"{self.region}/{name}"
+
+        def limited(*args, **kwargs):
+            return self.limiter.call(operation, attribute, *args, **kwargs)
+        return limited
+
+
+def get_rate_limiter(state_file=STATE_FILE):
+    """The process-wide limiter sharing `state_file` with the other scripts on this host."""
+    if state_file not in _shared:
+        _shared[state_file] = RateLimiter(state_file=state_file)
+    return _shared[state_file]
+
+
+def limit_client(client, limiter=None):
+    """Wrap a boto3 client so its API calls share the host-wide rate limits."""
+    return LimitedClient(client, limiter or get_rate_limiter())
+
+
+def limited_client(service, region_name=None, **config):
+    """
+    Create a boto3 client with CLIENT_RETRIES and wrap it with limit_client.
+    Other botocore Config options can be passed as keyword arguments.
+    """
+    import boto3
+    from botocore.config import Config
+    return limit_client(boto3.client(service, region_name=region_name,
+                                     config=Config(retries=dict(CLIENT_RETRIES), **config)))
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+
+import csv
+import os
+import threading
+
+from pipeline_metrics import metrics
+from profiling import profiled
+
+# ---------------
+# CONFIGURATION
+# ---------------
+PARQUET_COMPRESSION = "zstd"
+
+
+# ---------------
+# WRITERS
+# ---------------
+
+class ReportWriter:
+    """
+    Incremental report writer. Rows are appended with write_row() as each
+    document finishes and flush() is called once per document, so results
+    reach the disk during the batch rather than at the end.
+    Columns are `fieldnames`, or the keys of the first row.
+    Safe to share between threads.
+    """
+
+    def __init__(self, path, fieldnames=None):
+        self.path = path
+        self.fieldnames = list(fieldnames) if fieldnames else None
+        self.lock = threading.Lock()
+        self.rows_written = 0
+
+    @profiled('report_export')
+    def write_row(self, row):
+        with self.lock:
+            if self.fieldnames is None:
+                self.fieldnames = list(row)
+            self._write([_cell(row.get(name)) for name in self.fieldnames])
+            self.rows_written += 1
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write_row(row)
+
+    @profiled('report_export')
+    def flush(self):
+        with self.lock, metrics.stage('report_write'):
+            self._flush()
+
+    @profiled('report_export')
+    def close(self):
+        with self.lock, metrics.stage('report_write'):
+            self._close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write(self, values):
+        raise NotImplementedError
+
+    def _flush(self):
+        pass
+
+    def _close(self):
+        pass
+
+
+class CsvReportWriter(ReportWriter):
+    """Plain CSV; every flush() makes the rows so far durable."""
+
+    def __init__(self, path, fieldnames=None):
+        super().__init__(path, fieldnames)
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.header_written = False
+
+    def _write(self, values):
+        if not self.header_written:
+            self.writer.writerow(self.fieldnames)
+            self.header_written = True
+        self.writer.writerow(values)
+
+    def _flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def _close(self):
+        if not self.header_written and self.fieldnames:
+            self.writer.writerow(self.fieldnames)
+        self.file.close()
+
+
+class ExcelReportWriter(ReportWriter):
+    """
+    Constant-memory .xlsx through openpyxl's write-only mode: rows are
+    serialized to a temporary sheet file as they are appended instead of
+    being kept as cell objects. The workbook itself is only valid after
+    close(), so flush() has nothing to do here.
+    """
+
+    def __init__(self, path, fieldnames=None):
+        super().__init__(path, fieldnames)
+        from openpyxl import Workbook
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet()
+        self.header_written = False
+
+    def _write(self, values):
+        if not self.header_written:
+            self.sheet.append(self.fieldnames)
+            self.header_written = True
+        self.sheet.append(values)
+
+    def _close(self):
+        if not self.header_written and self.fieldnames:
+            self.sheet.append(self.fieldnames)
+        self.workbook.save(self.path)
+
+
+class ParquetReportWriter(ReportWriter):
+    """
+    Parquet via pyarrow for block- and field-level data. Rows are buffered
+    until flush(), which writes them out as one row group; the schema is
+    inferred from the first flushed rows. Columns that are empty (all None)
+    in those rows become nullable strings, as do columns of mixed types.
+    """
+
+    def __init__(self, path, fieldnames=None, compression=PARQUET_COMPRESSION):
+        super().__init__(path, fieldnames)
+        import pyarrow
+        import pyarrow.parquet
+        self.pyarrow = pyarrow
+        self.parquet = pyarrow.parquet
+        self.compression = compression
+        self.buffer = []
+        self.writer = None
+
+    def _write(self, values):
+        self.buffer.append(values)
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        columns = list(zip(*self.buffer))
+        if self.writer is None:
+            fields = []
+            for name, column in zip(self.fieldnames, columns):
+                try:
+                    column_type = self.pyarrow.array(list(column)).type
+                except (self.pyarrow.ArrowInvalid, self.pyarrow.ArrowTypeError):
+                    column_type = self.pyarrow.string()
+                if self.pyarrow.types.is_null(column_type):
+                    column_type = self.pyarrow.string()
+                fields.append(self.pyarrow.field(name, column_type))
+            schema = self.pyarrow.schema(fields)
+            self.writer = self.parquet.ParquetWriter(self.path, schema, compression=self.compression)
+        schema = self.writer.schema
+        table = self.pyarrow.Table.from_arrays(
+            [self._array(column, field.type) for column, field in zip(columns, schema)],
+            schema=schema
+        )
+        self.writer.write_table(table)
+        self.buffer = []
+
+    def _array(self, column, column_type):
+        if self.pyarrow.types.is_string(column_type):
+            column = [None if value is None else str(value) for value in column]
+        return self.pyarrow.array(list(column), type=column_type)
+
+    def _close(self):
+        self._flush()
+        if self.writer is not None:
+            self.writer.close()
+
+
+def _cell(value):
+    """Flatten list values (e.g. several studies) into one cell."""
+    if isinstance(value, (list, tuple)):
+        return ", ".join(str(v) for v in value)
+    return value
+
+
+WRITERS = {
+    ".csv": CsvReportWriter,
+    ".xlsx": ExcelReportWriter,
+    ".parquet": ParquetReportWriter,
+}
+
+
+def open_report_writer(path, fieldnames=None):
+    """Return the ReportWriter for the file extension of `path`."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in WRITERS:
+        raise ValueError(f"Unsupported report format: {path}")
+    return WRITERS[extension](path, fieldnames)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import threading
+
+# ---------------
+# CONFIGURATION
+# ---------------
+# Stages a document goes through, in order
+STAGES = ('submitted', 'downloaded', 'extracted')
+
+
+# ---------------
+# JOURNAL
+# ---------------
+
+class RunJournal:
+    """
+    Append-only JSONL checkpoint journal for batch runs. Each line records
+    one document reaching a stage:
+
+        {"document": "pdf/a.pdf", "stage": "submitted", "version": "<ETag>", "job_id": "..."}
+        {"document": "pdf/a.pdf", "stage": "extracted", "version": "<ETag>", "row": {...}}
+
+    Lines are flushed and fsynced as they are written, so after a crash or
+    Ctrl-C the journal says exactly how far every document got; a rerun
+    skips extracted documents (reusing their rows) and resumes the others
+    from their last stage. A torn last line is ignored on load.
+
+    `version` (the S3 ETag) ties an entry to one version of the document:
+    a changed PDF starts again from scratch. Delete the journal file to
+    force a full rerun. Safe to share between threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.state = {}  # document -> merged entry of its latest version
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn write from an interrupted run
+                    self._apply(entry)
+        self.file = open(path, "a", encoding="utf-8")
+
+    def _apply(self, entry):
+        if entry.get('stage') is None:
+            self.state.pop(entry['document'], None)
+            return
+        current = self.state.get(entry['document'])
+        if current is None or current.get('version') != entry.get('version'):
+            current = self.state[entry['document']] = {}
+        current.update(entry)
+
+    def record(self, document, stage, version=None, **data):
+        """Append that `document` reached `stage`, with any data to resume from."""
+        entry = {'document': document, 'stage': stage, 'version': version}
+        entry.update(data)
+        line = json.dumps(entry, default=str) + "\n"
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self._apply(entry)
+
+    def reset(self, document):
+        """Forget a document's progress (e.g. its job failed) so it starts over."""
+        self.record(document, None)
+
+    def entry(self, document, version=None):
+        """Return everything recorded for this version of the document, or {}."""
+        current = self.state.get(document)
+        if current is None or current.get('version') != version:
+            return {}
+        return current
+
+    def stage(self, document, version=None):
+        return self.entry(document, version).get('stage')
+
+    def reached(self, document, stage, version=None):
+        """True if the document got to `stage` (or further)."""
+        current = self.stage(document, version)
+        return current is not None and STAGES.index(current) >= STAGES.index(stage)
+
+    def done(self, document, version=None):
+        return self.stage(document, version) == 'extracted'
+
+    def rows(self, documents, versions=None):
+        """Return the stored rows of the extracted documents, in `documents` order."""
+        versions = versions or {}
+        return [self.entry(d, versions.get(d)).get('row') for d in documents
+                if self.done(d, versions.get(d))]
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+    def discard(self):
+        """Close and delete the journal once a run has completed."""
+        self.close()
+        os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from pipeline_metrics import metrics
+from rate_limiter import limited_client
+
+# ---------------
+# CONFIGURATION
+# ---------------
+MAX_POOL_CONNECTIONS = 50           # urllib3 pool per client (botocore default is 10)
+TRANSFER_WORKERS = 16               # objects downloaded at once
+RANGE_CHUNK_SIZE = 8 * 1024 * 1024  # objects above this are fetched as concurrent ranged GETs
+RANGE_WORKERS = 4                   # concurrent ranges per large object
+
+_clients = {}
+
+
+# ---------------
+# FUNCTIONS
+# ---------------
+
+def get_s3_client(region=None):
+    """
+    Return the shared S3 client for `region`, created once per process with
+    a connection pool large enough for the concurrent transfers below.
+    boto3 clients are thread-safe, so every script and thread reuses it.
+    Its calls share the host-wide rate limits (rate_limiter), which also
+    set botocore's retries.
+    """
+    if region not in _clients:
+        _clients[region] = limited_client('s3', region, max_pool_connections=MAX_POOL_CONNECTIONS,
+                                          tcp_keepalive=True)
+    return _clients[region]
+
+
+def _transfer_config():
+    from boto3.s3.transfer import TransferConfig
+    return TransferConfig(
+        multipart_threshold=RANGE_CHUNK_SIZE,
+        multipart_chunksize=RANGE_CHUNK_SIZE,
+        max_concurrency=RANGE_WORKERS
+    )
+
+
+def download_objects(s3_client, bucket, downloads, workers=TRANSFER_WORKERS, stage='s3_get'):
+    """
+    Download many objects concurrently. `downloads` is an iterable of
+    (key, local_path). Each file is written next to its target and renamed
+    when complete; large objects are split into ranged GETs by the transfer
+    manager. Returns the local paths; raises the first error after the
+    other downloads have finished. Each download is recorded as `stage`
+    for the calling thread's document.
+    """
+    document = metrics.current_document()
+    try:
+        transfer_config = _transfer_config()
+    except ImportError:
+        transfer_config = None
+
+    def download(key, local_path):
+        partial_path = f"{local_path}.part"
+        with metrics.stage(stage, document) as span:
+            if transfer_config is None:
+                s3_client.download_file(bucket, key, partial_path)
+            else:
+                s3_client.download_file(bucket, key, partial_path, Config=transfer_config)
+            span.add_bytes(os.path.getsize(partial_path))
+        os.replace(partial_path, local_path)
+        return local_path
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(download, key, local_path) for key, local_path in downloads]
+    return [future.result() for future in futures]
+
+
+def get_object_bytes(s3_client, bucket, key, size=None):
+    """
+    Read an object into memory. Objects larger than RANGE_CHUNK_SIZE are
+    fetched as concurrent ranged GETs and reassembled in order.
+    """
+    with metrics.stage('s3_get') as span:
+        data = _read_object(s3_client, bucket, key, size)
+        span.add_bytes(len(data))
+    return data
+
+
+def _read_object(s3_client, bucket, key, size):
+    if size is None:
+        size = s3_client.head_object(Bucket=bucket, Key=key)['ContentLength']
+    if size <= RANGE_CHUNK_SIZE:
+        return s3_client.get_object(Bucket=bucket, Key=key)['Body'].read()
+
+    def get_range(start):
+        end = min(start + RANGE_CHUNK_SIZE, size) - 1
+        response = s3_client.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}")
+        return response['Body'].read()
+
+    with ThreadPoolExecutor(max_workers=RANGE_WORKERS) as pool:
+        parts = list(pool.map(get_range, range(0, size, RANGE_CHUNK_SIZE)))
+    return b"".join(parts)
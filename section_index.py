@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+import re
+from collections import namedtuple
+
+# ---------------
+# CONFIGURATION
+# ---------------
+
+# Label headings that are not numbered, checked in this order
+NAMED_HEADINGS = [
+    ("highlights", re.compile(r"^HIGHLIGHTS OF PRESCRIBING INFORMATION\b")),
+    ("boxed_warning", re.compile(r"^(BOXED WARNING\b|WARNING:)")),
+    ("contents", re.compile(r"^FULL PRESCRIBING INFORMATION:\s*CONTENTS")),
+    ("full_prescribing_information", re.compile(r"^FULL PRESCRIBING INFORMATION\s*$")),
+]
+# "14 CLINICAL STUDIES", "5 WARNINGS AND PRECAUTIONS", ... (but not "14.1 ...").
+# Title case ("14 Clinical Studies") is accepted too, see SectionIndex.
+NUMBERED_HEADING = re.compile(r"^(\d{1,2})\s+([A-Z][A-Za-z0-9 ,&/()'-]*)$")
+MAX_SECTION_NUMBER = 17
+# Words left in lower case by title-case headings ("Use in Specific Populations")
+TITLE_SMALL_WORDS = {"a", "an", "and", "for", "in", "of", "on", "or", "the", "to", "with"}
+
+# A section runs from its heading line up to (not including) the next heading.
+# Lines are addressed as (page, index of the line within that page).
+Span = namedtuple('Span', 'start_page start_line end_page end_line')
+
+
+# ---------------
+# FUNCTIONS
+# ---------------
+
+def _is_title(title):
+    """True for an upper-case or title-case heading title."""
+    if title.isupper():
+        return True
+    return all(word[0].isupper() or word in TITLE_SMALL_WORDS
+               for word in title.split() if word[0].isalpha())
+
+
+def classify_heading(text):
+    """Return the section key for a heading line ("14", "highlights", ...) or None."""
+    text = text.strip()
+    match = NUMBERED_HEADING.match(text)
+    if match and 1 <= int(match.group(1)) <= MAX_SECTION_NUMBER and _is_title(match.group(2)):
+        return match.group(1)
+    for key, pattern in NAMED_HEADINGS:
+        if pattern.match(text):
+            return key
+    return None
+
+
+class SectionIndex:
+    """
+    Map of label sections (1-17, Boxed Warning, Highlights, ...) to the page
+    and line ranges they cover. Built incrementally with add_line() while the
+    LINE blocks are read, so no extra pass over the document is needed.
+
+    Numbered entries inside the table of contents are not sections; the
+    contents ends at the next named heading (usually the FULL PRESCRIBING
+    INFORMATION banner) or, without one, where the numbering starts again.
+    Upper-case headings may restart the numbering (several labels in one
+    file); title-case ones must follow the current section, so a table cell
+    such as "13 Weeks" inside Section 14 is not taken for a heading.
+    """
+
+    def __init__(self):
+        self.spans = {}          # key -> [Span, ...] in document order
+        self.line_counts = {}    # page -> lines seen so far
+        self.current = None      # (key, start_page, start_line)
+        self.contents_last = 0   # last section number listed in the contents
+        self.last_position = (1, 0)
+
+    def add_line(self, page, text):
+        line_no = self.line_counts.get(page, 0)
+        self.line_counts[page] = line_no + 1
+        self.last_position = (page, line_no + 1)
+
+        key = classify_heading(text)
+        if key is None:
+            return
+        current = self.current[0] if self.current is not None else None
+        if key.isdigit() and current == "contents":
+            if int(key) > self.contents_last:
+                self.contents_last = int(key)
+                return  # table of contents entry, not the section itself
+        elif key.isdigit() and current and current.isdigit() and not text.strip().isupper():
+            if int(key) <= int(current):
+                return
+        self._close(page, line_no)
+        self.current = (key, page, line_no)
+        if key == "contents":
+            self.contents_last = 0
+
+    def _close(self, end_page, end_line):
+        if self.current is not None:
+            key, start_page, start_line = self.current
+            self.spans.setdefault(key, []).append(Span(start_page, start_line, end_page, end_line))
+            self.current = None
+
+    def finish(self):
+        """Close the last open section at the end of the document."""
+        self._close(*self.last_position)
+        return self
+
+    def get(self, key):
+        """
+        Return the first Span of a section with more than its heading line
+        (a lone heading is a contents entry the index could not tell apart),
+        or None.
+        """
+        spans = self.spans.get(str(key))
+        if not spans:
+            return None
+        for span in spans:
+            if (span.start_page, span.start_line + 1) != (span.end_page, span.end_line):
+                return span
+        return spans[0]
+
+    def lines(self, pages, key):
+        """Return the lines of a section from a page -> lines dict."""
+        span = self.get(key)
+        if span is None:
+            return []
+        selected = []
+        for page in sorted(p for p in pages if span.start_page <= p <= span.end_page):
+            page_lines = pages[page]
+            start = span.start_line if page == span.start_page else 0
+            end = span.end_line if page == span.end_page else len(page_lines)
+            selected.extend(page_lines[start:end])
+        return selected
+
+
+def build_section_index(pages):
+    """Build a SectionIndex from a page -> lines dict (see group_text_by_page)."""
+    index = SectionIndex()
+    for page in sorted(pages):
+        for text in pages[page]:
+            index.add_line(page, text)
+    return index.finish()
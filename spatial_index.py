@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+import re
+from collections import namedtuple
+
+from textract_stream import iter_blocks
+
+# ---------------
+# CONFIGURATION
+# ---------------
+GRID_SIZE = 32           # the page is split into GRID_SIZE x GRID_SIZE cells
+MIN_COLUMN_GAP = 0.02    # vertical gutter (page width) that separates two columns
+MIN_BAND_GAP = 0.01      # horizontal gap (page height) that separates two bands
+MIN_ROW_OVERLAP = 0.5    # vertical overlap (of the shorter box) to be on the same row
+
+# Regions are (left, top, right, bottom) in page fractions, like Textract's
+# BoundingBox. The top of page 1 (header, highlights, boxed warning title):
+HEADER_REGION = (0.0, 0.0, 1.0, 0.5)
+
+# One indexed block; coordinates are page fractions
+Entry = namedtuple('Entry', 'text block_type left top right bottom id')
+
+
+# ---------------
+# FUNCTIONS
+# ---------------
+
+class PageIndex:
+    """
+    Uniform grid over the bounding boxes of one page. Each box is listed in
+    every cell it touches, so a region query only looks at the boxes in the
+    cells the region covers (a few dozen for a typical label page).
+    """
+
+    def __init__(self, grid_size=GRID_SIZE):
+        self.grid_size = grid_size
+        self.entries = []
+        self.cells = {}
+
+    def _cell_range(self, low, high):
+        last = self.grid_size - 1
+        return range(min(max(int(low * self.grid_size), 0), last),
+                     min(max(int(high * self.grid_size), 0), last) + 1)
+
+    def add(self, entry):
+        position = len(self.entries)
+        self.entries.append(entry)
+        for cx in self._cell_range(entry.left, entry.right):
+            for cy in self._cell_range(entry.top, entry.bottom):
+                self.cells.setdefault((cx, cy), []).append(position)
+
+    def query(self, region, block_types=None):
+        """Return the entries intersecting `region`, in the order they were added."""
+        left, top, right, bottom = region
+        found = set()
+        for cx in self._cell_range(left, right):
+            for cy in self._cell_range(top, bottom):
+                found.update(self.cells.get((cx, cy), ()))
+        result = []
+        for position in sorted(found):
+            entry = self.entries[position]
+            if block_types and entry.block_type not in block_types:
+                continue
+            if entry.left <= right and entry.right >= left and entry.top <= bottom and entry.bottom >= top:
+                result.append(entry)
+        return result
+
+    def right_of(self, entry, max_distance=0.5, block_types=None):
+        """
+        Return the nearest entry to the right of `entry` on the same row (the
+        value next to a label), or None.
+        """
+        candidates = self.query((entry.right, entry.top, entry.right + max_distance, entry.bottom),
+                                block_types)
+        best = None
+        for candidate in candidates:
+            if candidate is entry or candidate.left < entry.right - 0.005:
+                continue
+            overlap = min(entry.bottom, candidate.bottom) - max(entry.top, candidate.top)
+            shorter = min(entry.bottom - entry.top, candidate.bottom - candidate.top)
+            if shorter <= 0 or overlap < MIN_ROW_OVERLAP * shorter:
+                continue
+            if best is None or candidate.left < best.left:
+                best = candidate
+        return best
+
+    def find(self, pattern, region=None, block_types=None):
+        """Return the entries whose text matches `pattern` (case-insensitive)."""
+        regex = re.compile(pattern, re.IGNORECASE)
+        entries = self.entries if region is None else self.query(region)
+        return [e for e in entries
+                if (not block_types or e.block_type in block_types) and regex.search(e.text)]
+
+    def reading_order(self, region=None, block_types=None):
+        """
+        Return the entries (optionally only those in `region`) in
+        column-aware reading order: the page is cut recursively at vertical
+        gutters (columns, read left to right) and horizontal gaps (bands,
+        read top to bottom), and boxes inside a cut are read row by row.
+        """
+        if region is None:
+            entries = [e for e in self.entries if not block_types or e.block_type in block_types]
+        else:
+            entries = self.query(region, block_types)
+        return _xy_cut(entries)
+
+    def texts(self, region=None, block_types=('LINE',)):
+        """Return the text of the entries in `region`, in reading order."""
+        return [entry.text for entry in self.reading_order(region, block_types)]
+
+
+def _split(entries, low, high, min_gap):
+    """Split entries into groups separated by gaps of at least min_gap along one axis."""
+    ordered = sorted(entries, key=lambda e: getattr(e, low))
+    groups = [[ordered[0]]]
+    reach = getattr(ordered[0], high)
+    for entry in ordered[1:]:
+        if getattr(entry, low) - reach >= min_gap:
+            groups.append([])
+        groups[-1].append(entry)
+        reach = max(reach, getattr(entry, high))
+    return groups
+
+
+def _xy_cut(entries):
+    if len(entries) <= 1:
+        return list(entries)
+    for low, high, min_gap in (('left', 'right', MIN_COLUMN_GAP), ('top', 'bottom', MIN_BAND_GAP)):
+        groups = _split(entries, low, high, min_gap)
+        if len(groups) > 1:
+            return [entry for group in groups for entry in _xy_cut(group)]
+    return [entry for row in _rows(entries) for entry in sorted(row, key=lambda e: e.left)]
+
+
+def _rows(entries):
+    """Group entries into rows of vertically overlapping boxes, top to bottom."""
+    rows = []
+    for entry in sorted(entries, key=lambda e: e.top):
+        if rows:
+            row_top, row_bottom = rows[-1][0]
+            overlap = min(row_bottom, entry.bottom) - max(row_top, entry.top)
+            shorter = min(row_bottom - row_top, entry.bottom - entry.top)
+            if shorter > 0 and overlap >= MIN_ROW_OVERLAP * shorter:
+                rows[-1][0] = (row_top, max(row_bottom, entry.bottom))
+                rows[-1][1].append(entry)
+                continue
+        rows.append([(entry.top, entry.bottom), [entry]])
+    return [row for _, row in rows]
+
+
+class SpatialIndex:
+    """PageIndex per page, built from WORD/LINE blocks with add_block()."""
+
+    def __init__(self, grid_size=GRID_SIZE):
+        self.grid_size = grid_size
+        self.pages = {}
+
+    def add_block(self, block):
+        box = block.get('Geometry', {}).get('BoundingBox')
+        if not box:
+            return
+        page = self.pages.get(block.get('Page', 1))
+        if page is None:
+            page = self.pages[block.get('Page', 1)] = PageIndex(self.grid_size)
+        page.add(Entry(block.get('Text', ''), block['BlockType'], box['Left'], box['Top'],
+                       box['Left'] + box['Width'], box['Top'] + box['Height'], block['Id']))
+
+    def page(self, page_number):
+        """Return the PageIndex of a page (empty if the page has no blocks)."""
+        return self.pages.get(page_number) or PageIndex(self.grid_size)
+
+
+def build_spatial_index(source, block_types=('LINE', 'WORD'), pages=None):
+    """Build a SpatialIndex from anything textract_stream.iter_blocks accepts."""
+    index = SpatialIndex()
+    for block in iter_blocks(source, block_types=block_types, pages=pages):
+        index.add_block(block)
+    return index
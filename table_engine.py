@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+
+import re
+
+from textract_stream import iter_blocks
+
+# ---------------
+# CONFIGURATION
+# ---------------
+TABLE_BLOCK_TYPES = ('TABLE', 'CELL', 'MERGED_CELL', 'TABLE_TITLE', 'TABLE_FOOTER',
+                     'WORD', 'SELECTION_ELEMENT')
+CELL_BLOCK_TYPES = ('CELL', 'MERGED_CELL', 'TABLE_TITLE', 'TABLE_FOOTER')
+
+# A table whose title looks like a caption starts a new table even when it
+# directly follows a table with the same columns on the previous page
+CAPTION = re.compile(r"^\s*Table\s+\d+", re.IGNORECASE)
+
+# Study arms in Section 14 tables: the trial is named in the caption
+# ("... from the JAVELIN Bladder 100 Trial", "Study MM-009", "KEYNOTE-189"),
+# N and dose in the arm's column header ("BAVENCIO 10 mg/kg (N=350)")
+STUDY_NAME = re.compile(
+    r"\b(?:Study|Trial)\s+([A-Z0-9][\w-]*\d[\w-]*)"
+    r"|\b([A-Z][A-Za-z0-9-]*(?:\s+[A-Z0-9][A-Za-z0-9-]*)*)\s+(?:Trial|Study)\b"
+    r"|\b([A-Z]{3,}-\s?[A-Z]?\d+[A-Z]*)\b"
+)
+ARM_N = re.compile(r"\(?\s*\bN\s*=\s*([\d,]+)\s*\)?", re.IGNORECASE)
+ARM_DOSE = re.compile(r"\b\d+(?:\.\d+)?\s*(?:mg|mcg|µg|g|mL|units?)(?:\s*/\s*(?:kg|m2|m²|day|dose))?\b",
+                      re.IGNORECASE)
+
+
+# ---------------
+# TABLES
+# ---------------
+
+class Table:
+    """
+    One reconstructed table. `grid` is a list of rows of cell text, with
+    merged cells repeated over every position they span; `header_rows` are
+    the indexes of the rows made of COLUMN_HEADER cells. A table continued
+    over several pages has all its body rows and lists every page.
+    """
+
+    def __init__(self, page, title, grid, header_rows, footer=""):
+        self.page = page
+        self.pages = [page]
+        self.title = title
+        self.grid = grid
+        self.header_rows = header_rows
+        self.footer = footer
+
+    @property
+    def columns(self):
+        """Column names: the header rows joined per column, or 'Column N'."""
+        names = []
+        for col in range(len(self.grid[0]) if self.grid else 0):
+            parts = []
+            for row in self.header_rows:
+                text = self.grid[row][col]
+                if text and text not in parts:
+                    parts.append(text)
+            names.append(" ".join(parts) or f"Column {col + 1}")
+        return names
+
+    @property
+    def body(self):
+        """The rows that are not header rows."""
+        headers = set(self.header_rows)
+        return [row for i, row in enumerate(self.grid) if i not in headers]
+
+    def records(self):
+        """Return the body rows as dicts keyed by column name."""
+        columns = self.columns
+        return [dict(zip(columns, row)) for row in self.body]
+
+    def to_array(self):
+        import numpy as np
+        return np.array(self.grid, dtype=object)
+
+    def to_dataframe(self):
+        import pandas as pd
+        return pd.DataFrame(self.body, columns=_unique(self.columns))
+
+    def continues(self, previous):
+        """True if this table carries on `previous` from the page before."""
+        if previous.pages[-1] != self.page - 1 or not self.grid or not previous.grid:
+            return False
+        if len(self.grid[0]) != len(previous.grid[0]) or CAPTION.match(self.title):
+            return False
+        # Either no header of its own, or the previous table's header repeated
+        if not self.header_rows:
+            return True
+        return [self.grid[i] for i in self.header_rows] == [previous.grid[i] for i in previous.header_rows]
+
+    def extend(self, continuation):
+        headers = set(continuation.header_rows)
+        if continuation.title and not CAPTION.match(continuation.title):
+            # Textract often reads the first row of a continued table as its title
+            self.grid.append([continuation.title] + [""] * (len(self.grid[0]) - 1))
+        self.grid.extend(row for i, row in enumerate(continuation.grid) if i not in headers)
+        self.pages.append(continuation.page)
+
+
+def _unique(names):
+    seen = {}
+    result = []
+    for name in names:
+        seen[name] = seen.get(name, 0) + 1
+        result.append(name if seen[name] == 1 else f"{name} ({seen[name]})")
+    return result
+
+
+class TableBuilder:
+    """
+    Collects the table-related blocks of a document (fed with add_block(),
+    in any order) and resolves TABLE -> CELL/MERGED_CELL -> WORD through an
+    Id index once the document has been read, in time linear in the number
+    of blocks. Only word text and the cells' positions are kept.
+    """
+
+    def __init__(self):
+        self.words = {}    # WORD / SELECTION_ELEMENT Id -> text
+        self.cells = {}    # cell Id -> (row, col, row_span, col_span, is_header, child Ids)
+        self.pending = []  # (page, {relationship type: [Id, ...]}) per TABLE, in order
+
+    def add_block(self, block):
+        block_type = block['BlockType']
+        if block_type == 'WORD':
+            self.words[block['Id']] = block.get('Text', '')
+        elif block_type == 'SELECTION_ELEMENT':
+            self.words[block['Id']] = 'X' if block.get('SelectionStatus') == 'SELECTED' else ''
+        elif block_type in CELL_BLOCK_TYPES:
+            self.cells[block['Id']] = (
+                block.get('RowIndex'), block.get('ColumnIndex'),
+                block.get('RowSpan') or 1, block.get('ColumnSpan') or 1,
+                'COLUMN_HEADER' in (block.get('EntityTypes') or ()),
+                _child_ids(block)
+            )
+        elif block_type == 'TABLE':
+            relationships = {}
+            for relationship in block.get('Relationships') or ():
+                relationships.setdefault(relationship['Type'], []).extend(relationship['Ids'])
+            self.pending.append((block.get('Page', 1), relationships))
+
+    def _text(self, child_ids):
+        return " ".join(t for t in (self.words.get(i, '') for i in child_ids) if t)
+
+    def _build(self, page, relationships):
+        cells = [self.cells[i] for i in relationships.get('CHILD', ()) if i in self.cells]
+        if not cells:
+            return None
+        n_rows = max(c[0] + c[2] - 1 for c in cells)
+        n_cols = max(c[1] + c[3] - 1 for c in cells)
+        grid = [[""] * n_cols for _ in range(n_rows)]
+        header_rows = set()
+        for row, col, row_span, col_span, is_header, children in cells:
+            grid[row - 1][col - 1] = self._text(children)
+            if is_header:
+                header_rows.add(row - 1)
+
+        # A merged cell's text is its cells' text, repeated over its span
+        for merged_id in relationships.get('MERGED_CELL', ()):
+            if merged_id not in self.cells:
+                continue
+            row, col, row_span, col_span, is_header, children = self.cells[merged_id]
+            parts = [grid[self.cells[c][0] - 1][self.cells[c][1] - 1] for c in children if c in self.cells]
+            text = " ".join(p for p in parts if p)
+            for r in range(row - 1, min(row - 1 + row_span, n_rows)):
+                for c in range(col - 1, min(col - 1 + col_span, n_cols)):
+                    grid[r][c] = text
+                if is_header:
+                    header_rows.add(r)
+
+        title = " ".join(self._text(self.cells[i][5]) for i in relationships.get('TABLE_TITLE', ())
+                         if i in self.cells)
+        footer = " ".join(self._text(self.cells[i][5]) for i in relationships.get('TABLE_FOOTER', ())
+                          if i in self.cells)
+        return Table(page, title, grid, sorted(header_rows), footer)
+
+    def tables(self, merge_continued=True):
+        """
+        Return the document's tables in order. With merge_continued, a table
+        that starts a page and carries on the last table of the previous
+        page (same columns, no caption, no or the same header) is appended
+        to it instead of being returned separately.
+        """
+        result = []
+        last_page = None
+        for page, relationships in self.pending:
+            table = self._build(page, relationships)
+            if table is None:
+                continue
+            first_on_page = page != last_page
+            last_page = page
+            if merge_continued and first_on_page and result and table.continues(result[-1]):
+                result[-1].extend(table)
+            else:
+                result.append(table)
+        return result
+
+
+def _child_ids(block):
+    ids = []
+    for relationship in block.get('Relationships') or ():
+        if relationship['Type'] == 'CHILD':
+            ids.extend(relationship['Ids'])
+    return ids
+
+
+def extract_tables(source, pages=None, merge_continued=True):
+    """Return the Tables of anything textract_stream.iter_blocks accepts."""
+    builder = TableBuilder()
+    for block in iter_blocks(source, block_types=TABLE_BLOCK_TYPES, pages=pages):
+        builder.add_block(block)
+    return builder.tables(merge_continued)
+
+
+# ---------------
+# STUDIES
+# ---------------
+
+def study_name(text):
+    """Return the trial named in a caption ("JAVELIN Bladder 100", "MM-009") or None."""
+    match = STUDY_NAME.search(text or "")
+    if not match:
+        return None
+    return re.sub(r"-\s+", "-", next(group for group in match.groups() if group).strip())
+
+
+def study_rows(tables):
+    """
+    Return one row per study arm found in the column headers of `tables`:
+    {'Study', 'Arm', 'N', 'Dose', 'Page'}. Arms are the header cells that
+    carry an N (e.g. "Placebo (N=350)") or a dose. A table whose caption
+    names no trial belongs to the last trial named before it.
+    """
+    rows = []
+    study = None
+    for table in tables:
+        study = study_name(table.title) or study
+        for column in table.columns[1:]:
+            n = ARM_N.search(column)
+            dose = ARM_DOSE.search(ARM_N.sub("", column))
+            if not (n or dose):
+                continue
+            rows.append({
+                'Study': study or table.title,
+                'Arm': ARM_N.sub("", column).strip(),
+                'N': n.group(1).replace(",", "") if n else "",
+                'Dose': dose.group(0) if dose else "",
+                'Page': table.page,
+            })
+    return rows
+
+
+def summarize_studies(rows):
+    """
+    Collapse study_rows() into report cells: (studies, sample sizes, doses),
+    e.g. ("JAVELIN Bladder 100", "JAVELIN Bladder 100: 350, 350", "").
+    """
+    studies = []
+    sizes = {}
+    doses = {}
+    for row in rows:
+        if row['Study'] not in studies:
+            studies.append(row['Study'])
+        if row['N']:
+            sizes.setdefault(row['Study'], []).append(row['N'])
+        if row['Dose']:
+            doses.setdefault(row['Study'], []).append(row['Dose'])
+
+    def joined(values):
+        return "; ".join(f"{study}: {', '.join(values[study])}" for study in studies if study in values)
+
+    return ", ".join(s for s in studies if s), joined(sizes), joined(doses)
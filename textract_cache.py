@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+import gzip
+import hashlib
+import json
+import os
+
+from pipeline_metrics import metrics
+
+# ---------------
+# CONFIGURATION
+# ---------------
+CACHE_DIR = "./textract_cache"
+CACHE_MAX_BYTES = 2 * 1024 ** 3     # evict least recently used responses above this
+MODEL_VERSION = "1.0"               # AnalyzeDocumentModelVersion; bump to invalidate the cache
+
+
+# ---------------
+# FUNCTIONS
+# ---------------
+
+def pdf_content_id(pdf_bytes):
+    """Identify a PDF by the SHA-256 of its bytes."""
+    return "sha256:" + hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def s3_content_id(s3_client, bucket, key):
+    """
+    Identify an S3 PDF by its ETag, without downloading it.
+    The ETag changes whenever the object's bytes change.
+    """
+    response = s3_client.head_object(Bucket=bucket, Key=key)
+    return "etag:" + response['ETag'].strip('"')
+
+
+def cache_key(content_id, feature_types, model_version=MODEL_VERSION):
+    """Key a Textract response by document content, FeatureTypes and model version."""
+    features = ",".join(sorted(feature_types))
+    return hashlib.sha256(f"{content_id}|{features}|{model_version}".encode("utf-8")).hexdigest()
+
+
+class TextractCache:
+    """
+    Persistent, size-bounded cache of Textract responses on local disk.
+    Each response is stored gzip-compressed under its cache_key; reads bump
+    the file's mtime so eviction drops the least recently used entries.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self.total_bytes = sum(size for _, size, _ in self._entries())
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json.gz")
+
+    def _entries(self):
+        """Yield (path, size, mtime) for every cached response."""
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json.gz"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue  # removed by another process meanwhile
+                    yield path, stat.st_size, stat.st_mtime
+
+    def get(self, key):
+        """Return the cached response for `key`, or None."""
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                response = json.load(f)
+        except (FileNotFoundError, OSError, ValueError):
+            return None
+        try:
+            os.utime(path)  # mark as recently used for evict()
+        except OSError:
+            pass  # evicted by another process since the read; the response is still good
+        return response
+
+    def put(self, key, response):
+        """Store a response and evict old entries if the cache is over budget."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial_path = f"{path}.part"
+        with gzip.open(partial_path, "wt", encoding="utf-8") as f:
+            json.dump(response, f)
+        if os.path.exists(path):
+            self.total_bytes -= os.path.getsize(path)
+        os.replace(partial_path, path)
+        self.total_bytes += os.path.getsize(path)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Delete least recently used responses until the cache fits max_bytes."""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self.total_bytes = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self.total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # another process evicted it first
+            self.total_bytes -= size
+
+
+def cached_analyze_document(textract_client, cache, content_id, feature_types, document):
+    """
+    analyze_document with a cache in front of it. `content_id` comes from
+    pdf_content_id or s3_content_id. `document` is the Document argument, or
+    a function returning it so that e.g. the S3 download only happens on a
+    miss. On a hit no Textract call is made.
+    """
+    key = cache_key(content_id, feature_types)
+    response = cache.get(key)
+    metrics.count('textract_cache', result='miss' if response is None else 'hit')
+    if response is not None:
+        return response
+
+    if callable(document):
+        document = document()
+    with metrics.stage('textract_analyze'):
+        response = textract_client.analyze_document(Document=document, FeatureTypes=feature_types)
+    response.pop('ResponseMetadata', None)
+    cache.put(key, response)
+    return response
@@ -1,11 +1,8 @@
 #!/usr/bin/env python3
 
-import json
+from textract_stream import iter_lines
 
 def main():
-    with open("output_01072025.json", "r") as f:
-        data = json.load(f)
-    
     parsed_data = {
         "Black Box Warning": "N",  # default no
         "Compound": "",
@@ -19,11 +16,7 @@ def main():
     }
 
     # Debug: print out lines
-    all_lines = []
-    for block in data.get('Blocks', []):
-        if block.get('BlockType') == "LINE":
-            text = block.get('Text', '')
-            all_lines.append(text)
+    all_lines = [text for _, text in iter_lines("output_01072025.json")]
     
     print("\nDEBUG: All recognized lines from Textract:\n")
     for line in all_lines:
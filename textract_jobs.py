@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pipeline_metrics import metrics
+from profiling import profiler
+
+# ---------------
+# CONFIGURATION
+# ---------------
+MAX_IN_FLIGHT = 10          # concurrent async jobs; keep below the account's Textract quota
+HANDLER_WORKERS = 4         # threads downloading/parsing finished jobs
+FINISHED_STATUSES = ('SUCCEEDED', 'FAILED', 'PARTIAL_SUCCESS')
+
+
+# ---------------
+# FUNCTIONS
+# ---------------
+
+class JobPoller:
+    """
+    Tracker that polls every in-flight job with its own exponential backoff.
+    `get_status(job_id)` returns the job's current JobStatus string.
+    Calling the poller with the in-flight job ids sleeps until the earliest
+    job is due, polls every due job once and returns the finished ones as
+    (job_id, status) pairs.
+    """
+
+    def __init__(self, get_status, initial_delay=1.0, max_delay=30.0, backoff=2.0,
+                 sleep=time.sleep, clock=time.monotonic):
+        self.get_status = get_status
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.sleep = sleep
+        self.clock = clock
+        self.schedule = {}  # job_id -> [next poll time, current delay]
+
+    def __call__(self, job_ids):
+        now = self.clock()
+        for job_id in list(self.schedule):
+            if job_id not in job_ids:
+                del self.schedule[job_id]
+        for job_id in job_ids:
+            if job_id not in self.schedule:
+                self.schedule[job_id] = [now + self.initial_delay, self.initial_delay]
+
+        next_due = min(due for due, _ in self.schedule.values())
+        if next_due > now:
+            self.sleep(next_due - now)
+            now = self.clock()
+
+        finished = []
+        for job_id, entry in list(self.schedule.items()):
+            if entry[0] > now:
+                continue
+            status = self.get_status(job_id)
+            metrics.count('textract_polls')
+            if status in FINISHED_STATUSES:
+                finished.append((job_id, status))
+                del self.schedule[job_id]
+            else:
+                entry[1] = min(entry[1] * self.backoff, self.max_delay)
+                entry[0] = now + entry[1]
+        return finished
+
+
+def run_textract_jobs(documents, start_job, tracker, on_complete,
+                      max_in_flight=MAX_IN_FLIGHT, workers=HANDLER_WORKERS):
+    """
+    Keep up to `max_in_flight` Textract jobs running over `documents`.
+
+    - start_job(document) submits a job and returns its JobId.
+    - tracker(job_ids) waits and returns the finished (job_id, status) pairs,
+      e.g. a JobPoller.
+    - on_complete(document, job_id, status) downloads/parses a finished job.
+      It runs on a thread pool, so parsing overlaps with the jobs still running.
+
+    Returns a dict of document -> on_complete result (None if it failed).
+    Submission, the wait for each job (queue_wait) and everything
+    on_complete does are recorded in pipeline_metrics for the document.
+    """
+    pending = iter(documents)
+    in_flight = {}  # job_id -> document
+    submitted = {}  # job_id -> time.monotonic() at submission
+    futures = {}
+
+    def complete(document, job_id, status):
+        with metrics.document(document), profiler.document(document):
+            return on_complete(document, job_id, status)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        exhausted = False
+        while True:
+            while not exhausted and len(in_flight) < max_in_flight:
+                document = next(pending, None)
+                if document is None:
+                    exhausted = True
+                    break
+                try:
+                    with metrics.document(document), metrics.stage('textract_submit'):
+                        job_id = start_job(document)
+                except Exception as e:
+                    print(f"Error starting Textract job for {document}: {e}")
+                    futures[document] = None
+                    continue
+                print(f"Started Textract job {job_id} for {document} ({len(in_flight) + 1} in flight)")
+                in_flight[job_id] = document
+                submitted[job_id] = time.monotonic()
+
+            if not in_flight:
+                break
+
+            for job_id, status in tracker(list(in_flight)):
+                document = in_flight.pop(job_id)
+                metrics.observe('queue_wait', time.monotonic() - submitted.pop(job_id), document)
+                metrics.count('textract_jobs', status=status)
+                futures[document] = pool.submit(complete, document, job_id, status)
+
+    results = {}
+    for document, future in futures.items():
+        if future is None:
+            results[document] = None
+            continue
+        try:
+            results[document] = future.result()
+        except Exception as e:
+            print(f"Error handling Textract output for {document}: {e}")
+            results[document] = None
+    return results
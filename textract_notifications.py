@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import queue
+import time
+from collections import deque
+
+from textract_jobs import FINISHED_STATUSES
+
+# ---------------
+# CONFIGURATION
+# ---------------
+SQS_WAIT_SECONDS = 20       # SQS long polling; no cost while waiting
+SQS_MAX_MESSAGES = 10
+MAX_MESSAGE_WAIT = 15 * 60   # seconds without a message before the jobs are checked directly
+
+
+# ---------------
+# FUNCTIONS
+# ---------------
+
+def notification_channel(topic_arn, role_arn):
+    """Return the NotificationChannel argument for start_document_analysis."""
+    return {'SNSTopicArn': topic_arn, 'RoleArn': role_arn}
+
+
+def parse_completion(body):
+    """
+    Return (job_id, status) from a Textract completion message.
+    Accepts both the SNS envelope delivered to SQS and raw message delivery.
+    """
+    message = json.loads(body) if isinstance(body, str) else body
+    if 'Message' in message and 'JobId' not in message:
+        message = json.loads(message['Message'])
+    return message['JobId'], message['Status']
+
+
+class SqsQueue:
+    """Completion queue backed by an SQS queue subscribed to the SNS topic."""
+
+    def __init__(self, sqs_client, queue_url, wait_seconds=SQS_WAIT_SECONDS):
+        self.sqs_client = sqs_client
+        self.queue_url = queue_url
+        self.wait_seconds = wait_seconds
+
+    def receive(self):
+        """Return a list of (receipt, body) pairs, long-polling when empty."""
+        response = self.sqs_client.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=SQS_MAX_MESSAGES,
+            WaitTimeSeconds=self.wait_seconds
+        )
+        return [(m['ReceiptHandle'], m['Body']) for m in response.get('Messages', [])]
+
+    def delete(self, receipt):
+        self.sqs_client.delete_message(QueueUrl=self.queue_url, ReceiptHandle=receipt)
+
+
+class LocalQueue:
+    """In-process stand-in for SQS. Call publish() with a completion message."""
+
+    def __init__(self, wait_seconds=1.0):
+        self.messages = queue.Queue()
+        self.wait_seconds = wait_seconds
+
+    def publish(self, body):
+        self.messages.put(body if isinstance(body, str) else json.dumps(body))
+
+    def receive(self):
+        try:
+            received = [self.messages.get(timeout=self.wait_seconds)]
+        except queue.Empty:
+            return []
+        while len(received) < SQS_MAX_MESSAGES:
+            try:
+                received.append(self.messages.get_nowait())
+            except queue.Empty:
+                break
+        return [(None, body) for body in received]
+
+    def delete(self, receipt):
+        pass  # messages are removed on receive
+
+
+class FileQueue:
+    """
+    File-backed stand-in for SQS: one JSON message per line, appended by any
+    process. `<path>.offset` keeps the offset up to which every message has
+    been deleted, followed by the receipts of the messages deleted after
+    it, so a restarted consumer sees only the messages nobody deleted.
+    """
+
+    def __init__(self, path, wait_seconds=1.0):
+        self.path = path
+        self.offset_path = f"{path}.offset"
+        self.wait_seconds = wait_seconds
+        self.offset = 0
+        self.deleted = set()  # receipts deleted after the committed offset
+        if os.path.exists(self.offset_path):
+            with open(self.offset_path) as f:
+                offsets = [int(value) for value in f.read().split()]
+            if offsets:
+                self.offset, self.deleted = offsets[0], set(offsets[1:])
+        self.committed = self.offset
+        self.received = deque()  # receipts read after the committed offset, in file order
+
+    def publish(self, body):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write((body if isinstance(body, str) else json.dumps(body)) + "\n")
+
+    def receive(self):
+        received = []
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                f.seek(self.offset)
+                for line in iter(f.readline, ''):
+                    if not line.endswith("\n"):
+                        break  # message still being written
+                    self.offset = f.tell()
+                    if line.strip():
+                        self.received.append(self.offset)
+                        if self.offset not in self.deleted:
+                            received.append((self.offset, line))
+        if not received:
+            time.sleep(self.wait_seconds)
+        return received
+
+    def delete(self, receipt):
+        # Messages can be deleted out of order (early completions): the
+        # offset only moves past messages that were all deleted
+        if receipt <= self.committed or receipt in self.deleted:
+            return
+        self.deleted.add(receipt)
+        while self.received and self.received[0] in self.deleted:
+            self.committed = self.received.popleft()
+            self.deleted.discard(self.committed)
+        with open(self.offset_path, 'w') as f:
+            f.write(" ".join(str(offset) for offset in [self.committed] + sorted(self.deleted)))
+
+
+class QueueTracker:
+    """
+    Tracker for textract_jobs.run_textract_jobs driven by completion messages
+    instead of polling get_document_analysis. Jobs are submitted with a
+    NotificationChannel on TextractTopic (see set_sns_policy.sh), the topic
+    fans out to an SQS queue, and this drains it. LocalQueue and FileQueue
+    stand in for SQS offline.
+    Messages for jobs that are not in flight are left on the queue (SQS
+    redelivers them to whichever run owns them) and remembered in case the
+    job is tracked later; the message is deleted once that job is handled.
+    If no in-flight job has finished after `max_wait` seconds (a message
+    lost or moved to a dead-letter queue), each job's status is checked
+    once with `get_status(job_id)`, e.g. the scripts' check_job_status.
+    """
+
+    def __init__(self, completion_queue, get_status=None, max_wait=MAX_MESSAGE_WAIT,
+                 clock=time.monotonic):
+        self.queue = completion_queue
+        self.get_status = get_status
+        self.max_wait = max_wait
+        self.clock = clock
+        self.early = {}  # job_id -> (status, receipt), seen before the job was tracked
+        self.checked = set()  # jobs found finished by get_status; their late messages are deleted
+
+    def __call__(self, job_ids):
+        in_flight = set(job_ids)
+        finished = []
+        for job_id in job_ids:
+            if job_id in self.early:
+                status, receipt = self.early.pop(job_id)
+                finished.append((job_id, status))
+                self.queue.delete(receipt)
+        deadline = self.clock() + self.max_wait
+        while not finished:
+            if self.get_status is not None and self.clock() >= deadline:
+                finished = self._check(job_ids)
+                deadline = self.clock() + self.max_wait
+                if finished:
+                    break
+            for receipt, body in self.queue.receive():
+                try:
+                    job_id, status = parse_completion(body)
+                except (ValueError, KeyError) as e:
+                    print(f"Ignoring malformed completion message: {e}")
+                    self.queue.delete(receipt)
+                    continue
+                if job_id in in_flight:
+                    finished.append((job_id, status))
+                    self.queue.delete(receipt)
+                elif job_id in self.checked:
+                    self.checked.discard(job_id)
+                    self.queue.delete(receipt)
+                else:
+                    # Keep the latest receipt; older ones stop working on redelivery
+                    self.early[job_id] = (status, receipt)
+        return finished
+
+    def _check(self, job_ids):
+        """Check every in-flight job once; return the finished ones."""
+        finished = []
+        for job_id in job_ids:
+            try:
+                status = self.get_status(job_id)
+            except Exception as e:
+                print(f"Cannot check Textract job {job_id}: {e}")
+                continue
+            if status in FINISHED_STATUSES:
+                print(f"No completion message for Textract job {job_id}; it is {status}")
+                finished.append((job_id, status))
+                self.checked.add(job_id)
+        return finished
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+import os
+
+from pipeline_metrics import metrics
+from s3_transfer import download_objects
+
+# ---------------
+# FUNCTIONS
+# ---------------
+
+def job_output_prefix(output_prefix, job_id):
+    """Return the S3 prefix under which Textract writes the shards of one job."""
+    return f"{output_prefix.rstrip('/')}/{job_id}/"
+
+
+def list_job_shards(s3_client, bucket, output_prefix, job_id):
+    """
+    Return the S3 objects (dicts with Key/Size/ETag) written for one async
+    Textract job. Only the job's own prefix is listed, with pagination.
+    """
+    shards = []
+    paginator = s3_client.get_paginator('list_objects_v2')
+    with metrics.stage('s3_list'):
+        for page in paginator.paginate(Bucket=bucket, Prefix=job_output_prefix(output_prefix, job_id)):
+            for obj in page.get('Contents', []):
+                if obj['Key'].split('/')[-1].isdigit():
+                    shards.append(obj)
+    return shards
+
+
+def download_job_output(s3_client, bucket, output_prefix, job_id, local_dir="./output"):
+    """
+    Download the result shards of one job into `{local_dir}/{job_id}/` and
+    return that directory. Shards already on disk with the same size are
+    skipped, so re-running only fetches what is new since the last run.
+    The directory can be passed straight to textract_stream.iter_blocks,
+    which merges the shards in page order.
+    """
+    job_dir = os.path.join(local_dir, job_id)
+    os.makedirs(job_dir, exist_ok=True)
+
+    shards = list_job_shards(s3_client, bucket, output_prefix, job_id)
+    if not shards:
+        print(f"No output files found in {bucket}/{job_output_prefix(output_prefix, job_id)}")
+        return job_dir
+
+    missing = []
+    for obj in shards:
+        local_path = os.path.join(job_dir, obj['Key'].split('/')[-1])
+        if os.path.exists(local_path) and os.path.getsize(local_path) == obj['Size']:
+            continue
+        missing.append((obj['Key'], local_path))
+
+    # download_objects fetches the shards concurrently and renames each one
+    # into place when complete, so an interrupted run never leaves a
+    # truncated shard that looks finished
+    download_objects(s3_client, bucket, missing, stage='result_fetch')
+    return job_dir
@@ -0,0 +1,763 @@
+#!/usr/bin/env python3
+"""
+Offline stand-ins for the boto3 Textract and S3 clients, and an end-to-end
+throughput benchmark built on them.
+
+    python textract_simulator.py                          # 1,000 PDFs, polled, results paged from the API
+    python textract_simulator.py --result-mode s3         # results written to / downloaded from fake S3
+    python textract_simulator.py --script process_textract   # drive the script's own functions
+
+Jobs replay the checked-in Textract fixtures. Time is virtual: job
+latency, API latency, throttling back-off and the JobPoller's waits advance
+a VirtualClock instead of sleeping, so a batch that would take hours
+against AWS runs in seconds and reports documents per minute and tail
+latency in simulated time. Parsing still runs for real.
+"""
+
+import argparse
+import bisect
+import contextlib
+import functools
+import hashlib
+import io
+import json
+import math
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import Future
+
+try:
+    from botocore.exceptions import ClientError as _ClientError
+except ImportError:
+    _ClientError = Exception
+
+import s3_transfer
+import textract_jobs
+from process_testract_json_V1 import FIELD_RULES
+from rate_limiter import CLIENT_RETRIES, LimitedClient, RateLimiter
+from textract_jobs import MAX_IN_FLIGHT, JobPoller, run_textract_jobs
+from textract_output import download_job_output
+from textract_stream import iter_analysis_blocks, iter_blocks
+
+# ---------------
+# CONFIGURATION
+# ---------------
+FIXTURES = ["output.json", "output_01072025.json", "textract_output.json"]
+SEED = 7
+BATCH_SIZE = 1000                   # synthetic PDFs in the benchmark batch
+
+# Latencies are (median seconds, lognormal sigma); sigma 0 is a constant delay
+JOB_LATENCY = (20.0, 0.6)           # StartDocumentAnalysis -> job finished
+SYNC_LATENCY = (2.5, 0.4)           # AnalyzeDocument
+API_LATENCY = (0.08, 0.3)           # any other Textract call
+S3_LATENCY = (0.02, 0.5)            # first byte of an S3 request
+S3_BANDWIDTH = 80 * 1024 ** 2       # bytes/s per S3 request
+
+THROTTLE_RATE = 0.01                # calls rejected at random (ThrottlingException / SlowDown)
+FAILURE_RATE = 0.005                # jobs that end FAILED
+TPS_LIMITS = {                      # calls per second before ProvisionedThroughputExceededException
+    'StartDocumentAnalysis': 10,
+    'GetDocumentAnalysis': 10,
+    'AnalyzeDocument': 10,
+}
+MAX_CONCURRENT_JOBS = 100           # running async jobs before LimitExceededException
+MAX_ATTEMPTS = 5                    # botocore-style retries of throttled calls
+PAGE_SIZE = 1000                    # blocks per GetDocumentAnalysis page / output shard
+LIST_PAGE_SIZE = 1000               # keys per ListObjectsV2 page
+
+BUCKET = "simulated-bucket"
+PDF_PREFIX = "pdf/"
+OUTPUT_PREFIX = "textract_analysis/output/"
+
+RETRYABLE_CODES = ('ThrottlingException', 'ProvisionedThroughputExceededException',
+                   'LimitExceededException', 'SlowDown')
+
+
+# ---------------
+# CLOCK AND ERRORS
+# ---------------
+
+class VirtualClock:
+    """
+    Simulated time. Call it for the current time and use sleep() to wait,
+    e.g. JobPoller(get_status, sleep=clock.sleep, clock=clock).
+
+    Sleeping advances the shared time, unless the calling thread is on a
+    timeline of its own: timeline() (or fork() on another thread) starts
+    one at a given time, and its sleeps then only move that timeline, so
+    handlers downloading and parsing results run alongside the polling
+    loop instead of holding it up.
+    """
+
+    def __init__(self, start=0.0):
+        self.now = start
+        self.owner = threading.get_ident()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def __call__(self):
+        if getattr(self.local, 'time', None) is not None:
+            return self.local.time
+        with self.lock:
+            return self.now
+
+    def sleep(self, seconds):
+        seconds = max(seconds, 0.0)
+        if getattr(self.local, 'time', None) is None and threading.get_ident() == self.owner:
+            with self.lock:
+                self.now += seconds
+        else:
+            self.local.time = self() + seconds
+
+    def fork(self, start=None):
+        """Start the calling thread's own timeline at `start` (default: the shared time)."""
+        with self.lock:
+            self.local.time = self.now if start is None else start
+
+    @contextlib.contextmanager
+    def timeline(self, start):
+        """Run the block on a timeline of its own starting at `start`, then return to the previous one."""
+        previous = getattr(self.local, 'time', None)
+        self.local.time = start
+        try:
+            yield
+        finally:
+            self.local.time = previous
+
+
+class InlineExecutor:
+    """
+    Stand-in for ThreadPoolExecutor while simulating. Each task runs as soon
+    as it is submitted, on the calling thread, on a timeline starting when
+    the first of `max_workers` simulated workers is free, as if the pool ran
+    it in parallel with the others; leaving the `with` block waits for the
+    last one. Keeping the whole batch on one thread means the same seed
+    gives the same run, instead of one that depends on thread scheduling.
+    """
+
+    def __init__(self, clock, max_workers=None):
+        self.clock = clock
+        self.free_at = [clock()] * (max_workers or 1)
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        worker = self.free_at.index(min(self.free_at))
+        with self.clock.timeline(max(self.free_at[worker], self.clock())):
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            self.free_at[worker] = self.clock()
+        return future
+
+    def map(self, fn, *iterables):
+        futures = [self.submit(fn, *args) for args in zip(*iterables)]
+        return (future.result() for future in futures)
+
+    def shutdown(self, wait=True):
+        self.clock.sleep(max(self.free_at) - self.clock())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+
+class SimulatedClientError(_ClientError):
+    """
+    Error raised by the simulated clients. It has the shape of botocore's
+    ClientError (and is one when botocore is installed):
+    err.response['Error']['Code'], err.operation_name.
+    """
+
+    def __init__(self, code, message, operation_name):
+        response = {'Error': {'Code': code, 'Message': message},
+                    'ResponseMetadata': {'HTTPStatusCode': 400}}
+        if _ClientError is Exception:
+            Exception.__init__(self, f"An error occurred ({code}) when calling the "
+                                     f"{operation_name} operation: {message}")
+            self.response = response
+            self.operation_name = operation_name
+        else:
+            super().__init__(response, operation_name)
+
+
+# ---------------
+# SIMULATOR
+# ---------------
+
+class AwsSimulator:
+    """
+    Shared state behind the fake clients: the virtual clock, a seeded random
+    generator, the in-memory S3 buckets, the Textract jobs and call stats.
+    Use `simulator.textract` and `simulator.s3` wherever a boto3 client is
+    expected. Safe to share between threads. Draws made for a job under
+    job_random() come from that job's own generator.
+    """
+
+    def __init__(self, fixtures=FIXTURES, clock=None, seed=SEED,
+                 job_latency=JOB_LATENCY, sync_latency=SYNC_LATENCY, api_latency=API_LATENCY,
+                 s3_latency=S3_LATENCY, s3_bandwidth=S3_BANDWIDTH,
+                 throttle_rate=THROTTLE_RATE, failure_rate=FAILURE_RATE, tps_limits=None,
+                 max_concurrent_jobs=MAX_CONCURRENT_JOBS, max_attempts=MAX_ATTEMPTS,
+                 page_size=PAGE_SIZE, list_page_size=LIST_PAGE_SIZE):
+        self.clock = clock or VirtualClock()
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.local = threading.local()
+        self.job_latency = job_latency
+        self.sync_latency = sync_latency
+        self.api_latency = api_latency
+        self.s3_latency = s3_latency
+        self.s3_bandwidth = s3_bandwidth
+        self.throttle_rate = throttle_rate
+        self.failure_rate = failure_rate
+        self.tps_limits = TPS_LIMITS if tps_limits is None else tps_limits
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.max_attempts = max_attempts
+        self.page_size = page_size
+        self.list_page_size = list_page_size
+
+        self.lock = threading.RLock()
+        self.fixtures = [self._load_fixture(path) for path in fixtures]
+        self.buckets = {}           # bucket -> {key: (body, etag, visible_at)}
+        self.jobs = {}              # JobId -> job dict
+        self.recent_calls = {}      # operation -> sorted call times (TPS window)
+        self.stats = Counter()
+
+        self.textract = FakeTextractClient(self)
+        self.s3 = FakeS3Client(self)
+
+    def _load_fixture(self, path):
+        blocks = list(iter_blocks(path))
+        pages = max((block.get('Page', 1) for block in blocks), default=1)
+        metadata = {'Pages': pages}
+        shards = []  # the JSON files Textract would write for a job's OutputConfig
+        for i, start in enumerate(range(0, max(len(blocks), 1), self.page_size), 1):
+            body = json.dumps({'DocumentMetadata': metadata, 'JobStatus': 'SUCCEEDED',
+                               'Blocks': blocks[start:start + self.page_size],
+                               'AnalyzeDocumentModelVersion': '1.0'}).encode('utf-8')
+            shards.append((str(i), body))
+        return {'path': path, 'blocks': blocks, 'metadata': metadata, 'shards': shards}
+
+    def fixture_for(self, name):
+        """The fixture replayed for a document, picked deterministically from its name."""
+        if isinstance(name, str):
+            name = name.encode('utf-8')
+        return self.fixtures[zlib.crc32(name) % len(self.fixtures)]
+
+    @contextlib.contextmanager
+    def job_random(self, index):
+        """Draw from a generator of job `index`'s own, seeded from the simulator's seed, in the block."""
+        previous = getattr(self.local, 'rng', None)
+        self.local.rng = random.Random(f"{self.seed}/{index}")
+        try:
+            yield
+        finally:
+            self.local.rng = previous
+
+    def random(self):
+        """The current job's generator under job_random(), else the shared one (use under the lock)."""
+        return getattr(self.local, 'rng', None) or self.rng
+
+    def sample(self, latency):
+        median, sigma = latency
+        if sigma <= 0:
+            return median
+        with self.lock:
+            return self.random().lognormvariate(math.log(median), sigma)
+
+    def chance(self, rate):
+        with self.lock:
+            return self.random().random() < rate
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.stats[name] += amount
+
+    def call(self, operation, handler, latency, throttle_code='ThrottlingException'):
+        """
+        Run one API call: wait out its latency, reject it when over the TPS
+        limit or at the random throttle rate, and retry throttling errors
+        (RETRYABLE_CODES) with jittered exponential back-off the way botocore
+        does. Other errors are raised straight away.
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            self.clock.sleep(self.sample(latency))
+            self.count(f"{operation}.calls")
+            try:
+                code = self._rejection(operation, throttle_code)
+                if code is not None:
+                    raise SimulatedClientError(code, "Rate exceeded", operation)
+                return handler()
+            except SimulatedClientError as e:
+                code = e.response['Error']['Code']
+                self.count(f"{operation}.{code}")
+                if code not in RETRYABLE_CODES or attempt == self.max_attempts:
+                    raise
+            with self.lock:
+                backoff = self.random().random() * min(20.0, 2.0 ** attempt)
+            self.count('retries')
+            self.clock.sleep(backoff)
+
+    def _rejection(self, operation, throttle_code):
+        now = self.clock()
+        limit = self.tps_limits.get(operation)
+        with self.lock:
+            if limit:
+                # Call times from every timeline, sorted; forked handler
+                # threads can be a little behind the shared time
+                calls = self.recent_calls.setdefault(operation, [])
+                del calls[:bisect.bisect_left(calls, self.clock.now - 60.0)]
+                if bisect.bisect_right(calls, now) - bisect.bisect_right(calls, now - 1.0) >= limit:
+                    return 'ProvisionedThroughputExceededException'
+                bisect.insort(calls, now)
+            if self.random().random() < self.throttle_rate:
+                return throttle_code
+        return None
+
+    # S3 storage, shared by both clients
+
+    def put(self, bucket, key, body, visible_at=None):
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        with self.lock:
+            self.buckets.setdefault(bucket, {})[key] = (body, etag, visible_at)
+        return etag
+
+    def lookup(self, bucket, key, operation):
+        with self.lock:
+            objects = self.buckets.get(bucket)
+            if objects is None:
+                raise SimulatedClientError('NoSuchBucket', "The specified bucket does not exist", operation)
+            found = objects.get(key)
+        if found is None or (found[2] is not None and found[2] > self.clock()):
+            code = '404' if operation == 'HeadObject' else 'NoSuchKey'
+            raise SimulatedClientError(code, "The specified key does not exist.", operation)
+        return found
+
+    def add_pdfs(self, count, bucket=BUCKET, prefix=PDF_PREFIX):
+        """Store `count` synthetic PDFs and return their keys."""
+        keys = []
+        for i in range(count):
+            key = f"{prefix}document-{i:05d}.pdf"
+            self.put(bucket, key, f"%PDF-1.4\n% simulated document {i}\n%%EOF\n".encode('ascii'))
+            keys.append(key)
+        return keys
+
+
+class FakeTextractClient:
+    """The Textract calls the scripts make, replayed from the fixtures."""
+
+    def __init__(self, simulator):
+        self.sim = simulator
+
+    def start_document_analysis(self, DocumentLocation, FeatureTypes, OutputConfig=None, **kwargs):
+        sim = self.sim
+        location = DocumentLocation['S3Object']
+
+        def start():
+            sim.lookup(location['Bucket'], location['Name'], 'StartDocumentAnalysis')
+            now = sim.clock()
+            with sim.lock:
+                running = sum(1 for job in sim.jobs.values() if job['finished_at'] > now)
+                if running >= sim.max_concurrent_jobs:
+                    raise SimulatedClientError('LimitExceededException',
+                                               "Open jobs exceed maximum concurrent job limit",
+                                               'StartDocumentAnalysis')
+                job_id = f"{sim.random().getrandbits(256):064x}"
+            job = {
+                'fixture': sim.fixture_for(location['Name']),
+                'started_at': now,
+                'finished_at': now + sim.sample(sim.job_latency),
+                'failed': sim.chance(sim.failure_rate),
+            }
+            with sim.lock:
+                sim.jobs[job_id] = job
+            sim.count('jobs.started')
+            if OutputConfig:
+                # Shards appear under <prefix>/<JobId>/ once the job has finished
+                output_prefix = f"{OutputConfig.get('S3Prefix', '').rstrip('/')}/{job_id}/"
+                sim.put(OutputConfig['S3Bucket'], output_prefix + ".s3_access_check", b"{}")
+                if not job['failed']:
+                    for name, body in job['fixture']['shards']:
+                        sim.put(OutputConfig['S3Bucket'], output_prefix + name, body, job['finished_at'])
+            return {'JobId': job_id}
+
+        return sim.call('StartDocumentAnalysis', start, sim.api_latency)
+
+    def get_document_analysis(self, JobId, MaxResults=PAGE_SIZE, NextToken=None):
+        sim = self.sim
+
+        def get():
+            job = sim.jobs.get(JobId)
+            if job is None:
+                raise SimulatedClientError('InvalidJobIdException', "An invalid job identifier was passed.",
+                                           'GetDocumentAnalysis')
+            if sim.clock() < job['finished_at']:
+                return {'JobStatus': 'IN_PROGRESS'}
+            if job['failed']:
+                return {'JobStatus': 'FAILED', 'StatusMessage': "Simulated job failure"}
+            fixture = job['fixture']
+            start = int(NextToken or 0)
+            end = start + min(MaxResults, PAGE_SIZE)
+            response = {
+                'DocumentMetadata': dict(fixture['metadata']),
+                'JobStatus': 'SUCCEEDED',
+                'AnalyzeDocumentModelVersion': '1.0',
+                # Copies, since callers such as remap_block_pages update blocks in place
+                'Blocks': [dict(block) for block in fixture['blocks'][start:end]],
+            }
+            if end < len(fixture['blocks']):
+                response['NextToken'] = str(end)
+            return response
+
+        return sim.call('GetDocumentAnalysis', get, sim.api_latency)
+
+    def analyze_document(self, Document, FeatureTypes, **kwargs):
+        sim = self.sim
+
+        def analyze():
+            if 'S3Object' in Document:
+                location = Document['S3Object']
+                sim.lookup(location['Bucket'], location['Name'], 'AnalyzeDocument')
+                fixture = sim.fixture_for(location['Name'])
+            else:
+                fixture = sim.fixture_for(Document['Bytes'])
+            return {'DocumentMetadata': dict(fixture['metadata']),
+                    'AnalyzeDocumentModelVersion': '1.0',
+                    'Blocks': [dict(block) for block in fixture['blocks']]}
+
+        return sim.call('AnalyzeDocument', analyze, sim.sync_latency)
+
+
+class _Body(io.BytesIO):
+    """StreamingBody stand-in: read(), iteration and close()."""
+
+
+class _ListObjectsPaginator:
+    def __init__(self, client):
+        self.client = client
+
+    def paginate(self, **params):
+        params = dict(params)
+        while True:
+            page = self.client.list_objects_v2(**params)
+            yield page
+            if not page.get('IsTruncated'):
+                return
+            params['ContinuationToken'] = page['NextContinuationToken']
+
+
+class FakeS3Client:
+    """The S3 calls the scripts make, against in-memory buckets."""
+
+    def __init__(self, simulator):
+        self.sim = simulator
+
+    def _call(self, operation, handler):
+        sim = self.sim
+        return sim.call(operation, handler, sim.s3_latency, throttle_code='SlowDown')
+
+    def _transfer(self, size):
+        """Wait for `size` bytes to stream at the per-request bandwidth."""
+        self.sim.clock.sleep(size / self.sim.s3_bandwidth)
+        self.sim.count('s3.bytes', size)
+
+    def put_object(self, Bucket, Key, Body=b"", **kwargs):
+        body = Body.read() if hasattr(Body, 'read') else Body
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self._transfer(len(body))
+        return self._call('PutObject', lambda: {'ETag': self.sim.put(Bucket, Key, body)})
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, Callback=None, Config=None):
+        with open(Filename, 'rb') as f:
+            self.put_object(Bucket=Bucket, Key=Key, Body=f.read())
+
+    def head_object(self, Bucket, Key, **kwargs):
+        def head():
+            body, etag, _ = self.sim.lookup(Bucket, Key, 'HeadObject')
+            return {'ContentLength': len(body), 'ETag': etag}
+        return self._call('HeadObject', head)
+
+    def get_object(self, Bucket, Key, Range=None, **kwargs):
+        def get():
+            body, etag, _ = self.sim.lookup(Bucket, Key, 'GetObject')
+            if Range:
+                start, end = Range.split('=', 1)[1].split('-')
+                body = body[int(start):int(end) + 1]
+            return {'Body': _Body(body), 'ContentLength': len(body), 'ETag': etag}
+        response = self._call('GetObject', get)
+        self._transfer(response['ContentLength'])
+        return response
+
+    def download_file(self, Bucket, Key, Filename, ExtraArgs=None, Callback=None, Config=None):
+        body = self.get_object(Bucket=Bucket, Key=Key)['Body'].read()
+        with open(Filename, 'wb') as f:
+            f.write(body)
+
+    def list_objects_v2(self, Bucket, Prefix='', Delimiter=None, MaxKeys=None, ContinuationToken=None,
+                        StartAfter=None, **kwargs):
+        sim = self.sim
+        max_keys = min(MaxKeys or sim.list_page_size, sim.list_page_size)
+
+        def list_page():
+            now = sim.clock()
+            with sim.lock:
+                if Bucket not in sim.buckets:
+                    raise SimulatedClientError('NoSuchBucket', "The specified bucket does not exist",
+                                               'ListObjectsV2')
+                objects = sorted((key, body, etag) for key, (body, etag, visible_at) in sim.buckets[Bucket].items()
+                                 if key.startswith(Prefix) and (visible_at is None or visible_at <= now))
+            after = ContinuationToken or StartAfter or ''
+            contents, prefixes = [], []
+            last = None
+            for key, body, etag in objects:
+                if key <= after:
+                    continue
+                if Delimiter and Delimiter in key[len(Prefix):]:
+                    common = key[:key.index(Delimiter, len(Prefix)) + len(Delimiter)]
+                    if prefixes and prefixes[-1] == common:
+                        last = key
+                        continue
+                    if len(contents) + len(prefixes) == max_keys:
+                        break
+                    prefixes.append(common)
+                else:
+                    if len(contents) + len(prefixes) == max_keys:
+                        break
+                    contents.append({'Key': key, 'Size': len(body), 'ETag': etag})
+                last = key
+            else:
+                last = None
+            page = {'Name': Bucket, 'Prefix': Prefix, 'KeyCount': len(contents) + len(prefixes),
+                    'MaxKeys': max_keys, 'IsTruncated': last is not None}
+            if contents:
+                page['Contents'] = contents
+            if prefixes:
+                page['CommonPrefixes'] = [{'Prefix': p} for p in prefixes]
+            if last is not None:
+                page['NextContinuationToken'] = last
+            return page
+
+        return self._call('ListObjectsV2', list_page)
+
+    def get_paginator(self, operation_name):
+        if operation_name != 'list_objects_v2':
+            raise NotImplementedError(f"No simulated paginator for {operation_name}")
+        return _ListObjectsPaginator(self)
+
+
+def patch_clients(module, simulator):
+    """Point a script's module-level textract_client / s3_client at the simulator."""
+    if hasattr(module, 'textract_client'):
+        module.textract_client = simulator.textract
+    if hasattr(module, 's3_client'):
+        module.s3_client = simulator.s3
+
+
+# ---------------
+# BENCHMARK
+# ---------------
+
+def _percentile(values, percent):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method='inclusive')[percent - 1]
+
+
+def run_async_batch(simulator, documents=BATCH_SIZE, result_mode="api", max_in_flight=MAX_IN_FLIGHT,
+                    script=None):
+    """
+    Push `documents` synthetic PDFs through run_textract_jobs with a
+    JobPoller on the simulator's clock. Returns (document -> latency in
+    simulated seconds, results, simulated time the last document finished). With `script` (e.g. "process_textract")
+    the script's own start_textract_job / check_job_status /
+    download_textract_output are used, with its clients patched.
+    """
+    clock = simulator.clock
+    bucket, output_bucket, output_prefix = BUCKET, BUCKET, OUTPUT_PREFIX
+    start_job_in = lambda key: simulator.textract.start_document_analysis(
+        DocumentLocation={'S3Object': {'Bucket': bucket, 'Name': key}},
+        FeatureTypes=["TABLES", "FORMS"],
+        **({'OutputConfig': {'S3Bucket': output_bucket, 'S3Prefix': output_prefix}}
+           if result_mode == "s3" else {}))['JobId']
+    get_status = lambda job_id: simulator.textract.get_document_analysis(JobId=job_id, MaxResults=1)['JobStatus']
+    download = lambda job_id, local_dir: download_job_output(simulator.s3, output_bucket, output_prefix,
+                                                            job_id, local_dir)
+    parse = lambda source: FIELD_RULES.extract(block['Text'] for block in iter_blocks(source, block_types='LINE'))
+
+    if script:
+        import importlib
+        module = importlib.import_module(script)
+        patch_clients(module, simulator)
+        bucket = getattr(module, 's3_bucket', bucket)
+        output_bucket = getattr(module, 'analysis_output_bucket', output_bucket)
+        output_prefix = getattr(module, 'output_prefix', output_prefix)
+        result_mode = getattr(module, 'result_mode', result_mode)
+        start_job_in = lambda key: module.start_textract_job(bucket, key)
+        get_status = module.check_job_status
+        download = lambda job_id, local_dir: module.download_textract_output(output_bucket, output_prefix,
+                                                                            job_id, local_dir)
+        parse = getattr(module, 'parse_textract_output', parse)
+
+    simulator.add_pdfs(documents, bucket)
+    # List them back the way the scripts do (paginated)
+    paginator = simulator.s3.get_paginator('list_objects_v2')
+    keys = [obj['Key'] for page in paginator.paginate(Bucket=bucket, Prefix=PDF_PREFIX)
+            for obj in page.get('Contents', [])]
+
+    submitted_at, finished_at = {}, {}
+    job_documents = {}
+
+    index = {key: i for i, key in enumerate(keys)}
+
+    def start_job(key):
+        submitted_at[key] = clock()
+        with simulator.job_random(index[key]):
+            job_id = start_job_in(key)
+        job_documents[job_id] = key
+        return job_id
+
+    poller = JobPoller(get_status, sleep=clock.sleep, clock=clock)
+
+    def tracker(job_ids):
+        finished = poller(job_ids)
+        for job_id, _ in finished:
+            finished_at[job_documents[job_id]] = clock()
+        return finished
+
+    local_dir = tempfile.mkdtemp(prefix="textract_simulator_")
+
+    def on_complete(key, job_id, status):
+        # Runs on a timeline of its own (InlineExecutor), from when the poller
+        # saw the job finish or a handler worker became free
+        try:
+            with simulator.job_random(index[key]):
+                if status != 'SUCCEEDED':
+                    return None
+                if result_mode == "api":
+                    return parse(iter_analysis_blocks(simulator.textract, job_id))
+                job_dir = download(job_id, local_dir)
+                try:
+                    return parse(job_dir)
+                finally:
+                    shutil.rmtree(job_dir, ignore_errors=True)
+        finally:
+            finished_at[key] = clock()
+
+    # The handler pool and the download pools run inline on simulated workers
+    pools = [textract_jobs, s3_transfer]
+    executors = [pool.ThreadPoolExecutor for pool in pools]
+    for pool in pools:
+        pool.ThreadPoolExecutor = functools.partial(InlineExecutor, clock)
+    try:
+        results = run_textract_jobs(keys, start_job, tracker, on_complete, max_in_flight=max_in_flight)
+    finally:
+        for pool, executor in zip(pools, executors):
+            pool.ThreadPoolExecutor = executor
+        shutil.rmtree(local_dir, ignore_errors=True)
+
+    latencies = {key: finished_at[key] - submitted_at[key] for key in finished_at}
+    return latencies, results, max(finished_at.values(), default=clock())
+
+
+def run_sync_batch(simulator, documents=BATCH_SIZE):
+    """Analyze `documents` synthetic PDFs one at a time with analyze_document, as extract_textract_data does."""
+    clock = simulator.clock
+    latencies, results = {}, {}
+    for key in simulator.add_pdfs(documents):
+        start = clock()
+        try:
+            response = simulator.textract.analyze_document(
+                Document={'S3Object': {'Bucket': BUCKET, 'Name': key}}, FeatureTypes=["TABLES", "FORMS"])
+            results[key] = FIELD_RULES.extract(block['Text'] for block in iter_blocks(response, block_types='LINE'))
+        except Exception as e:
+            print(f"Error analyzing {key}: {e}")
+            results[key] = None
+        latencies[key] = clock() - start
+    return latencies, results, clock()
+
+
+def report(simulator, latencies, results, makespan, wall_seconds):
+    """Print throughput, tail latency and API stats for a batch; return them as a dict."""
+    succeeded = sum(1 for value in results.values() if value is not None)
+    values = sorted(latencies.values())
+    summary = {
+        'documents': len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'simulated_seconds': makespan,
+        'documents_per_minute': succeeded / makespan * 60 if makespan else 0.0,
+        'latency_p50': _percentile(values, 50),
+        'latency_p90': _percentile(values, 90),
+        'latency_p99': _percentile(values, 99),
+        'latency_max': values[-1] if values else 0.0,
+        'wall_seconds': wall_seconds,
+    }
+    print(f"Documents: {summary['documents']} ({succeeded} succeeded, {summary['failed']} failed)")
+    print(f"Simulated time: {makespan / 60:.1f} min -> {summary['documents_per_minute']:.1f} documents/min"
+          f" (wall {wall_seconds:.1f}s)")
+    print(f"Latency per document: p50 {summary['latency_p50']:.1f}s, p90 {summary['latency_p90']:.1f}s,"
+          f" p99 {summary['latency_p99']:.1f}s, max {summary['latency_max']:.1f}s")
+    print("API calls:")
+    for name, count in sorted(simulator.stats.items()):
+        print(f"  {name:<60} {count}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end Textract batch benchmark against simulated AWS.")
+    parser.add_argument("--documents", type=int, default=BATCH_SIZE, help="synthetic PDFs in the batch")
+    parser.add_argument("--mode", choices=["async", "sync"], default="async",
+                        help="async jobs with polling, or analyze_document per PDF")
+    parser.add_argument("--result-mode", choices=["api", "s3"], default="api",
+                        help="page results from get_document_analysis or download the S3 shards")
+    parser.add_argument("--script", help="drive this script's functions instead, e.g. process_textract")
+    parser.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT)
+    parser.add_argument("--fixtures", nargs="+", default=FIXTURES, help="Textract output replayed by jobs")
+    parser.add_argument("--job-latency", type=float, nargs=2, default=JOB_LATENCY, metavar=("MEDIAN", "SIGMA"))
+    parser.add_argument("--throttle-rate", type=float, default=THROTTLE_RATE)
+    parser.add_argument("--failure-rate", type=float, default=FAILURE_RATE)
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="put the clients behind rate_limiter's AIMD token buckets")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--json", help="also write the summary to this JSON file")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show the scripts' per-job output")
+    args = parser.parse_args()
+
+    # Limited clients are created with botocore's CLIENT_RETRIES (see rate_limiter.limited_client)
+    max_attempts = CLIENT_RETRIES['max_attempts'] if args.rate_limit else MAX_ATTEMPTS
+    simulator = AwsSimulator(fixtures=args.fixtures, seed=args.seed, job_latency=tuple(args.job_latency),
+                             throttle_rate=args.throttle_rate, failure_rate=args.failure_rate,
+                             max_attempts=max_attempts)
+    if args.rate_limit:
+        random.seed(args.seed)  # rate_limiter's retry jitter
+        limiter = RateLimiter(sleep=simulator.clock.sleep, clock=simulator.clock)
+        simulator.textract = LimitedClient(simulator.textract, limiter)
+        simulator.s3 = LimitedClient(simulator.s3, limiter)
+    start = time.perf_counter()
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        if args.mode == "sync":
+            latencies, results, makespan = run_sync_batch(simulator, args.documents)
+        else:
+            latencies, results, makespan = run_async_batch(simulator, args.documents, args.result_mode,
+                                                 args.max_in_flight, args.script)
+    summary = report(simulator, latencies, results, makespan, time.perf_counter() - start)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 0 if summary['succeeded'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+
+import codecs
+import json
+import os
+
+from pipeline_metrics import metrics
+
+# ---------------
+# CONFIGURATION
+# ---------------
+CHUNK_SIZE = 64 * 1024  # characters read from the source per refill
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+# ---------------
+# FUNCTIONS
+# ---------------
+
+class _ChunkReader:
+    """
+    Minimal incremental JSON reader over a file-like object.
+    Holds at most one block plus one chunk of text in memory.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.utf8 = None
+
+    def fill(self):
+        """Read the next chunk into the buffer. Return False at end of stream."""
+        if self.eof:
+            return False
+        chunk = self.stream.read(CHUNK_SIZE)
+        if isinstance(chunk, bytes):
+            if self.utf8 is None:
+                self.utf8 = codecs.getincrementaldecoder("utf-8")()
+            chunk = self.utf8.decode(chunk, final=not chunk)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop what has already been consumed before growing the buffer
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += chunk
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Malformed Textract JSON: expected {char!r}, found {found!r}")
+        self.pos += 1
+
+    def value(self):
+        """Decode one complete JSON value starting at the current position."""
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # A number that ends exactly at the buffer edge may continue in the next chunk
+            if end == len(self.buf) and self.fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def _iter_stream_blocks(stream, metadata):
+    """Yield each entry of the top-level "Blocks" array of a Textract response stream."""
+    reader = _ChunkReader(stream)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        key = reader.value()
+        reader.expect(":")
+        if key == "Blocks":
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.pos += 1
+            else:
+                while True:
+                    yield reader.value()
+                    if reader.peek() == ",":
+                        reader.pos += 1
+                        continue
+                    reader.expect("]")
+                    break
+        else:
+            value = reader.value()
+            if metadata is not None:
+                metadata[key] = value
+        if reader.peek() == ",":
+            reader.pos += 1
+            continue
+        reader.expect("}")
+        return
+
+
+def shard_paths(job_dir):
+    """
+    Return the result shards of an async Textract job directory in page order.
+    Textract names its output objects 1, 2, ..., N; anything else in the
+    directory (.s3_access_check, partial downloads) is ignored.
+    """
+    names = [name for name in os.listdir(job_dir)
+             if name.isdigit() and os.path.isfile(os.path.join(job_dir, name))]
+    return [os.path.join(job_dir, name) for name in sorted(names, key=int)]
+
+
+def _timed_parse(stream, metadata):
+    """_iter_stream_blocks, recorded as the json_parse stage."""
+    try:
+        size = os.fstat(stream.fileno()).st_size
+    except (AttributeError, OSError, ValueError):
+        size = 0  # S3 bodies and in-memory streams
+    return metrics.timed_iter(_iter_stream_blocks(stream, metadata), 'json_parse', bytes_moved=size)
+
+
+def _iter_source_blocks(source, metadata):
+    """Dispatch on the kind of source and yield raw blocks."""
+    if isinstance(source, dict):
+        if metadata is not None:
+            metadata.update((k, v) for k, v in source.items() if k != "Blocks")
+        yield from source.get("Blocks", [])
+    elif isinstance(source, (str, bytes, os.PathLike)) and os.path.isdir(source):
+        # A job directory is one logical document: chain its shards in order,
+        # keeping the metadata of the first shard
+        for path in shard_paths(source):
+            with open(path, "rb") as f:
+                yield from _timed_parse(f, metadata)
+            metadata = None
+    elif isinstance(source, (str, bytes, os.PathLike)):
+        with open(source, "rb") as f:
+            yield from _timed_parse(f, metadata)
+    elif hasattr(source, "read"):
+        yield from _timed_parse(source, metadata)
+    else:
+        # Any other iterable is assumed to already yield block dicts
+        yield from source
+
+
+def _as_filter(value):
+    if value is None:
+        return None
+    if isinstance(value, (str, int)):
+        return {value}
+    return set(value)
+
+
+def iter_blocks(source, block_types=None, pages=None, metadata=None):
+    """
+    Yield Textract blocks one at a time, without loading the whole response.
+
+    `source` may be a path to a Textract JSON file, a job directory of
+    numbered result shards (merged in page order), an open file or S3
+    `StreamingBody` (text or bytes), an already-decoded response dict, or any
+    iterable of block dicts. Blocks are filtered by `BlockType` and `Page` as
+    they are read; both filters accept a single value or a collection.
+    If `metadata` is a dict, the top-level keys other than "Blocks"
+    (DocumentMetadata, JobStatus, NextToken, ...) are stored into it.
+    """
+    type_filter = _as_filter(block_types)
+    page_filter = _as_filter(pages)
+    for block in _iter_source_blocks(source, metadata):
+        if type_filter is not None and block.get("BlockType") not in type_filter:
+            continue
+        if page_filter is not None and block.get("Page", 1) not in page_filter:
+            continue
+        yield block
+
+
+def iter_lines(source, pages=None):
+    """Yield (page, text) for every LINE block in reading order."""
+    for block in iter_blocks(source, block_types="LINE", pages=pages):
+        yield block.get("Page", 1), block.get("Text", "")
+
+
+def iter_words(source, pages=None):
+    """Yield (page, text) for every WORD block."""
+    for block in iter_blocks(source, block_types="WORD", pages=pages):
+        yield block.get("Page", 1), block.get("Text", "")
+
+
+def iter_analysis_blocks(textract_client, job_id, block_types=None, pages=None, metadata=None,
+                         max_results=1000):
+    """
+    Stream the blocks of a finished async job straight from
+    get_document_analysis, following NextToken page by page. Nothing is
+    written to S3 or disk; only one page of results is held at a time.
+    """
+    request = {'JobId': job_id, 'MaxResults': max_results}
+    while True:
+        with metrics.stage('result_fetch'):
+            response = textract_client.get_document_analysis(**request)
+        yield from iter_blocks(response, block_types=block_types, pages=pages, metadata=metadata)
+        metadata = None  # keep the first page's DocumentMetadata/JobStatus
+        next_token = response.get('NextToken')
+        if not next_token:
+            return
+        request['NextToken'] = next_token
+
+
+def iter_s3_blocks(s3_client, bucket, key, block_types=None, pages=None, metadata=None):
+    """Stream the blocks of a Textract JSON object stored in S3."""
+    body = s3_client.get_object(Bucket=bucket, Key=key)["Body"]
+    try:
+        yield from iter_blocks(body, block_types=block_types, pages=pages, metadata=metadata)
+    finally:
+        body.close()
@@ -1,21 +1,10 @@
-import json
-import csv
+from report_writers import open_report_writer
+from textract_stream import iter_words
 
-# Load JSON data
-with open('textract_output.json', 'r') as file:
-    data = json.load(file)
-
-# Extract words
-words = [
-    block['Text']
-    for block in data['Blocks']
-    if block['BlockType'] == 'WORD'
-]
-
-# Save to CSV
-with open('textract_words.csv', 'w', newline='') as csvfile:
-    writer = csv.writer(csvfile)
-    writer.writerow(["Words"])
-    for word in words:
-        writer.writerow([word])
+words_output = 'textract_words.csv'  # .csv, .xlsx or .parquet
 
+# Stream WORD blocks straight from the JSON into the report
+with open('textract_output.json', 'rb') as source, \
+        open_report_writer(words_output, ["Words"]) as writer:
+    for _, word in iter_words(source):
+        writer.write_row({"Words": word})